@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Crypto Pool Benchmark
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Verify & decrypt N messages (ECC signature + RSA message key) from
+    several senders, in the event loop and in the crypto pool with
+    different workers, to see how it scales on this host:
+
+        python3 bots/bench_crypto.py -n 2000 -w 1,2,4,8
+"""
+
+import asyncio
+import getopt
+import os
+import sys
+import time
+from typing import List
+
+from dimples import PrivateKey, AsymmetricAlgorithms
+
+from dimples.utils import Log
+from dimples.utils import Path
+
+path = Path.abs(path=__file__)
+path = Path.dir(path=path)
+path = Path.dir(path=path)
+Path.add(path=path)
+
+from libs.client import LibraryLoader
+from libs.client import CryptoPool
+
+
+SENDERS = 16
+
+
+def show_help():
+    cmd = sys.argv[0]
+    print('')
+    print('    Crypto Pool Benchmark')
+    print('')
+    print('usages:')
+    print('    %s [-n count] [-w workers]' % cmd)
+    print('')
+    print('optional arguments:')
+    print('    -n count    messages to verify & decrypt, default is 1000')
+    print('    -w workers  workers count list, default is "1,2,4"')
+    print('')
+
+
+async def run_local(messages: List, sign_keys: List, msg_key: PrivateKey) -> float:
+    start = time.time()
+    for index, (data, signature, ciphertext) in enumerate(messages):
+        pub = sign_keys[index % SENDERS].public_key
+        assert pub.verify(data=data, signature=signature), 'signature error'
+        assert msg_key.decrypt(ciphertext=ciphertext) is not None, 'decrypt error'
+    return time.time() - start
+
+
+async def run_pool(workers: int, messages: List, sign_keys: List, msg_key: PrivateKey) -> float:
+    pool = CryptoPool(workers=workers)
+    pub_keys = [[key.public_key.to_dict()] for key in sign_keys]
+    pri_keys = [msg_key.to_dict()]
+    # start the workers before timing
+    await asyncio.gather(*[pool.decrypt(sender='warm', keys=pri_keys, ciphertexts=[messages[0][2]])
+                           for _ in range(workers * 4)])
+    order = {}
+
+    async def process(index: int, data: bytes, signature: bytes, ciphertext: bytes):
+        sender = 'sender-%d' % (index % SENDERS)
+        ok = await pool.verify(sender=sender, keys=pub_keys[index % SENDERS], data=data, signature=signature)
+        assert ok, 'signature error'
+        key = await pool.decrypt(sender=sender, keys=pri_keys, ciphertexts=[ciphertext])
+        assert key is not None, 'decrypt error'
+        last = order.get(sender, -1)
+        assert last < index, 'order error: %s, %d, %d' % (sender, last, index)
+        order[sender] = index
+
+    start = time.time()
+    await asyncio.gather(*[process(index, *item) for index, item in enumerate(messages)])
+    cost = time.time() - start
+    pool.shutdown()
+    return cost
+
+
+async def main():
+    try:
+        opts, args = getopt.getopt(args=sys.argv[1:], shortopts='hn:w:')
+    except getopt.GetoptError:
+        show_help()
+        sys.exit(1)
+    count = 1000
+    workers_list = [1, 2, 4]
+    for opt, arg in opts:
+        if opt == '-n':
+            count = int(arg)
+        elif opt == '-w':
+            workers_list = [int(item) for item in arg.split(',')]
+        else:
+            show_help()
+            sys.exit(0)
+    LibraryLoader().run()
+    sign_keys = [PrivateKey.generate(algorithm=AsymmetricAlgorithms.ECC) for _ in range(SENDERS)]
+    msg_key = PrivateKey.generate(algorithm=AsymmetricAlgorithms.RSA)
+    messages = []
+    for index in range(count):
+        data = os.urandom(256)
+        signature = sign_keys[index % SENDERS].sign(data=data)
+        ciphertext = msg_key.public_key.encrypt(plaintext=os.urandom(32))
+        messages.append((data, signature, ciphertext))
+    print('CPUs: %d, messages: %d' % (os.cpu_count(), count))
+    base = await run_local(messages=messages, sign_keys=sign_keys, msg_key=msg_key)
+    print('event loop: %.3f seconds, %.0f msg/s' % (base, count / base))
+    for workers in workers_list:
+        cost = await run_pool(workers=workers, messages=messages, sign_keys=sign_keys, msg_key=msg_key)
+        print('workers %2d: %.3f seconds, %.0f msg/s, speedup %.2fx' % (workers, cost, count / cost, base / cost))
+
+
+if __name__ == '__main__':
+    Log.LEVEL = Log.RELEASE
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Redis Bulk Reading Check
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Save metas & visas of N generated users with MetaCache & DocumentCache,
+    then load them back one by one and by BulkMetaCache & BulkDocumentCache
+    (MGET) from the redis server in config ('[redis] enable = on'), check
+    both results are same, and remove them after:
+
+        python3 bots/check_redis.py --config=/etc/dim/stat.ini -n 1000
+"""
+
+import asyncio
+import getopt
+import sys
+import time
+
+from dimples import ID, Meta, MetaType, Document, DocumentType
+from dimples import PrivateKey, AsymmetricAlgorithms
+from dimples.database.redis import MetaCache, DocumentCache
+
+from dimples.utils import Log
+from dimples.utils import Path
+
+path = Path.abs(path=__file__)
+path = Path.dir(path=path)
+path = Path.dir(path=path)
+Path.add(path=path)
+
+from libs.utils import Config
+from libs.client import LibraryLoader
+from libs.database import BulkMetaCache, BulkDocumentCache
+
+
+def show_help():
+    cmd = sys.argv[0]
+    print('')
+    print('    Redis Bulk Reading Check')
+    print('')
+    print('usages:')
+    print('    %s --config=<FILE> [-n count]' % cmd)
+    print('')
+    print('optional arguments:')
+    print('    --config    config file path with [redis] section')
+    print('    -n count    users to save & load, default is 1000')
+    print('')
+
+
+async def main():
+    try:
+        opts, args = getopt.getopt(args=sys.argv[1:], shortopts='hn:', longopts=['help', 'config='])
+    except getopt.GetoptError:
+        show_help()
+        sys.exit(1)
+    ini_file = None
+    count = 1000
+    for opt, arg in opts:
+        if opt == '--config':
+            ini_file = arg
+        elif opt == '-n':
+            count = int(arg)
+        else:
+            show_help()
+            sys.exit(0)
+    if ini_file is None:
+        show_help()
+        sys.exit(1)
+    LibraryLoader().run()
+    config = Config()
+    await config.load(path=ini_file)
+    assert config.redis_connector is not None, 'redis not enabled: %s' % ini_file
+    meta_cache = MetaCache(config=config)
+    doc_cache = DocumentCache(config=config)
+    # 1. save with the single key caches
+    users = []
+    for index in range(count):
+        private_key = PrivateKey.generate(algorithm=AsymmetricAlgorithms.ECC)
+        meta = Meta.generate(version=MetaType.MKM, private_key=private_key, seed='check%d' % index)
+        identifier = ID.generate(meta=meta, network=0)
+        visa = Document.create(doc_type=DocumentType.VISA)
+        visa['did'] = str(identifier)
+        visa.set_property(name='name', value='check %d' % index)
+        visa.sign(private_key=private_key)
+        await meta_cache.save_meta(meta=meta, identifier=identifier)
+        await doc_cache.save_documents(documents=[visa], identifier=identifier)
+        users.append((identifier, meta, visa))
+    # an ID not in redis
+    missing = ID.parse(identifier='moky@4DnqXWdTV8wuZgfqSCX9GjE2kNq7HJrUgQ')
+    identifiers = [item[0] for item in users] + [missing]
+    try:
+        # 2. load one by one
+        start = time.time()
+        single_metas = {}
+        single_docs = {}
+        for identifier in identifiers:
+            meta = await meta_cache.get_meta(identifier=identifier)
+            if meta is not None:
+                single_metas[identifier] = meta
+            array = await doc_cache.load_documents(identifier=identifier)
+            if array is not None:
+                single_docs[identifier] = array
+        single_cost = time.time() - start
+        # 3. load with MGET
+        start = time.time()
+        metas = await BulkMetaCache(config=config).get_metas(identifiers=identifiers)
+        docs = await BulkDocumentCache(config=config).get_documents_list(identifiers=identifiers)
+        bulk_cost = time.time() - start
+        # 4. compare, should be same as loaded one by one
+        errors = 0
+        for identifier, meta, visa in users:
+            loaded = metas.get(identifier)
+            expected = single_metas.get(identifier)
+            if loaded is None or expected is None or loaded.to_dict() != expected.to_dict():
+                print('meta not match: %s' % identifier)
+                errors += 1
+            elif loaded.public_key != meta.public_key:
+                print('meta key not match: %s' % identifier)
+                errors += 1
+            array = docs.get(identifier)
+            expected = single_docs.get(identifier)
+            if array is None or expected is None or [doc.to_dict() for doc in array] != \
+                    [doc.to_dict() for doc in expected]:
+                print('documents not match: %s' % identifier)
+                errors += 1
+            elif array[0].get('data') != visa.get('data') or array[0].get('signature') != visa.get('signature'):
+                print('visa not match: %s' % identifier)
+                errors += 1
+        if missing in metas or missing in docs:
+            print('missing ID found: %s' % missing)
+            errors += 1
+        print('loaded %d metas, %d documents for %d IDs, one by one: %.3f seconds, MGET: %.3f seconds, errors: %d'
+              % (len(metas), len(docs), len(identifiers), single_cost, bulk_cost, errors))
+    finally:
+        # 5. clean up
+        meta_redis = meta_cache.redis
+        doc_redis = doc_cache.redis
+        for identifier, _, _ in users:
+            meta_redis.delete('mkm.meta.%s' % identifier)
+            doc_redis.delete('mkm.document.%s' % identifier)
+    sys.exit(1 if errors > 0 else 0)
+
+
+if __name__ == '__main__':
+    Log.LEVEL = Log.RELEASE
+    asyncio.run(main())
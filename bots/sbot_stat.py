@@ -32,6 +32,7 @@
 
 from typing import Optional, List
 
+from dimples import EntityType
 from dimples import ReliableMessage
 from dimples import ContentType, Content
 from dimples import CustomizedContent
@@ -44,17 +45,27 @@ from dimples.client.cpu.app.filter import get_app_filter
 
 from dimples.utils import Log, Logging
 from dimples.utils import Path, Runner
+from dimples.database import Storage
 
 path = Path.abs(path=__file__)
 path = Path.dir(path=path)
 path = Path.dir(path=path)
 Path.add(path=path)
 
+from libs.utils import IPLocator
+from libs.utils import LaneScheduler
+from libs.utils import FrequencyChecker
+from libs.utils import get_supervisors
 from libs.client import ClientContentProcessorCreator
+from libs.client import Emitter
+from libs.client import CryptoManager
 
-from bots.shared import GlobalVariable
+from bots.shared import GlobalVariable, BotMessenger
 from bots.shared import create_config, start_bot
 from bots.stat_recoder import g_recorder
+from bots.stat_records import StatRecord
+from bots.stat_records import parse_record, parse_batch
+from bots.stat_acks import AckTracker, AckSender
 from bots.stat_text import TextContentProcessor
 
 
@@ -65,19 +76,31 @@ class StatHandler(BaseCustomizedContentHandler, Logging):
         self.__users_listeners = None
         self.__stats_listeners = None
         self.__speeds_listeners = None
+        # alert each station once an hour at most
+        self.__alert_checker = FrequencyChecker(expires=3600)
 
     # Override
     async def handle_action(self, content: CustomizedContent, msg: ReliableMessage,
                             messenger: CommonMessenger) -> List[Content]:
         mod = content.module
-        if mod == 'users':
+        if mod == 'batch':
+            try:
+                records = parse_batch(content=content)
+            except Exception as error:
+                self.error(msg='failed to parse batch [%s]: %s' % (content.time, error))
+                return []
+            self.info(msg='received station log [%s] batch: %d records' % (content.time, len(records)))
+            records = self._check_sequence(content=content, msg=msg, records=records)
+            if len(records) > 0:
+                g_recorder.add_records(records=records)
+                await self._send_alerts()
+            return []
+        elif mod == 'users':
             users = content.get('users')
             self.info(msg='received station log [%s] users: %s' % (content.time, users))
-            g_recorder.add_log(content=content)
         elif mod == 'stats':
             stats = content.get('stats')
             self.info(msg='received station log [%s] stats: %s' % (content.time, stats))
-            g_recorder.add_log(content=content)
         elif mod == 'speeds':
             user = content.get('U')
             provider = content.get('provider')
@@ -85,13 +108,61 @@ class StatHandler(BaseCustomizedContentHandler, Logging):
             remote = content.get('remote_address')
             self.info(msg='received client log [%s] speeds count: %d, %s, %s => %s'
                           % (content.time, len(stations), remote, user, provider))
-            g_recorder.add_log(content=content)
         else:
             act = content.action
             self.error(msg='unknown module: %s, action: %s, [%s] %s' % (mod, act, content.time, content))
+            return []
+        # convert to compact record before queueing
+        try:
+            record = parse_record(content=content)
+        except Exception as error:
+            self.error(msg='failed to parse %s [%s]: %s' % (mod, content.time, error))
+            return []
+        if record is not None:
+            for rec in self._check_sequence(content=content, msg=msg, records=[record]):
+                g_recorder.add_record(record=rec)
+        await self._send_alerts()
         # respond nothing
         return []
 
+    def _check_sequence(self, content: CustomizedContent, msg: ReliableMessage,
+                        records: List[StatRecord]) -> List[StatRecord]:
+        """ attach ack ticket to records, return the records not saved yet """
+        sn = content.get('sn')
+        if not isinstance(sn, int):
+            # ack not supported
+            return records
+        ticket = AckTracker().receive(station=msg.sender, sn=sn, count=len(records), session=content.get('session'))
+        if ticket is None:
+            self.warning(msg='duplicated log from %s, sn: %d' % (msg.sender, sn))
+            return []
+        array = []
+        for index, rec in enumerate(records):
+            if index in ticket.saved:
+                # saved before the log failed
+                continue
+            rec.ticket = ticket
+            rec.index = index
+            array.append(rec)
+        return array
+
+    async def _send_alerts(self):
+        """ push latency alerts to supervisors """
+        alerts = g_recorder.detector.pop_alerts()
+        if len(alerts) == 0:
+            return
+        checker = self.__alert_checker
+        alerts = [item for item in alerts if checker.is_expired(key=item.station)]
+        if len(alerts) == 0:
+            return
+        shared = GlobalVariable()
+        supervisors = await get_supervisors(config=shared.config, facebook=shared.facebook, section='statistic')
+        emitter = Emitter()
+        for item in alerts:
+            self.warning(msg='%s, supervisors: %s' % (item, supervisors))
+            for receiver in supervisors:
+                await emitter.send_text_message(text='Alert\n\n----\n%s' % item, receiver=receiver)
+
 
 # -----------------------------------------------------------------------------
 #  Message Extensions
@@ -103,7 +174,7 @@ def register_customized_handlers():
     # 'chat.dim.monitor:*'
     handler = StatHandler()
     app = 'chat.dim.monitor'
-    modules = ['users', 'stats', 'speeds']
+    modules = ['users', 'stats', 'speeds', 'batch']
     for mod in modules:
         app_filter.set_content_handler(app=app, mod=mod, handler=handler)
 
@@ -124,12 +195,65 @@ class BotContentProcessorCreator(ClientContentProcessorCreator):
         return super().create_content_processor(msg_type=msg_type)
 
 
+#
+#   Priority Lanes
+#
+LANE_INTERACTIVE = 'interactive'  # text commands from users
+LANE_BULK = 'bulk'                # logs from stations & clients
+
+g_lanes = LaneScheduler(workers=2)
+g_lanes.add_lane(name=LANE_INTERACTIVE, weight=8, capacity=1024)
+g_lanes.add_lane(name=LANE_BULK, weight=1, capacity=65536)
+
+
+def select_lane(msg: ReliableMessage) -> Optional[str]:
+    """ pick a lane by content type & sender type before verifying/decrypting """
+    msg_type = msg.type
+    if msg_type is None or msg_type in [ContentType.COMMAND, ContentType.HISTORY]:
+        # urgent (handshake, meta, documents, ...), process immediately
+        return None
+    elif msg_type in [ContentType.CUSTOMIZED, ContentType.APPLICATION]:
+        # 'chat.dim.monitor'
+        return LANE_BULK
+    sender_type = msg.sender.type
+    if sender_type == EntityType.STATION or sender_type == EntityType.BOT:
+        return LANE_BULK
+    return LANE_INTERACTIVE
+
+
 class BotMessageProcessor(ClientMessageProcessor):
 
     # Override
     def _create_creator(self, facebook: CommonFacebook, messenger: CommonMessenger) -> ContentProcessorCreator:
         return BotContentProcessorCreator(facebook=self.facebook, messenger=self.messenger)
 
+    # Override
+    async def process_reliable_message(self, msg: ReliableMessage) -> List[ReliableMessage]:
+        lane = select_lane(msg=msg)
+        if lane is None:
+            return await super().process_reliable_message(msg=msg)
+        # messages from the same sender are processed one by one in order
+        if not g_lanes.submit(lane=lane, factory=lambda: self.__process(msg=msg), key=str(msg.sender)):
+            # lane is full, process it right now instead of dropping it silently
+            self.warning(msg='lane "%s" is full, process message inline: %s -> %s'
+                             % (lane, msg.sender, msg.receiver))
+            return await super().process_reliable_message(msg=msg)
+        messenger = self.messenger
+        if isinstance(messenger, BotMessenger):
+            # responses (or receipt) will be sent after processed in the lane
+            messenger.defer_receipt(msg=msg)
+        return []
+
+    async def __process(self, msg: ReliableMessage):
+        responses = await super().process_reliable_message(msg=msg)
+        messenger = self.messenger
+        if len(responses) == 0 and isinstance(messenger, BotMessenger):
+            receipt = await messenger.build_receipt(msg=msg)
+            if receipt is not None:
+                responses = [receipt]
+        for res in responses:
+            await messenger.send_reliable_message(msg=res, priority=1)
+
 
 #
 # show logs
@@ -152,11 +276,24 @@ async def main():
     #
     g_recorder.config = shared.config
     g_recorder.start()
+    # respond acks for saved logs
+    path = Storage(config=shared.config).protected_path('{PROTECTED}/stat_acks.js')
+    await AckTracker().load(path=path)
+    AckSender().start()
+    # offline IP table for reports
+    locator = IPLocator()
+    locator.config = shared.config
+    # keep enough messages in flight for the crypto pool,
+    # lanes still process messages from the same sender in order
+    pool = CryptoManager().pool
+    if pool is not None:
+        g_lanes.workers = max(g_lanes.workers, pool.workers * 2)
     #
     #  Create & start the bot
     #
     client = await start_bot(ans_name='statistic', processor_class=BotMessageProcessor)
     Log.warning(msg='bot stopped: %s' % client)
+    await shared.database.flush()
 
 
 if __name__ == '__main__':
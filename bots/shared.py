@@ -23,15 +23,20 @@
 # SOFTWARE.
 # ==============================================================================
 
+import asyncio
 import getopt
 import sys
-from typing import Optional
+from typing import Optional, Set
 
 from dimples import ID
+from dimples import InstantMessage, SecureMessage, ReliableMessage
+from dimples import EncryptedBundle, DefaultVisaAgent
+from dimples import Command
 from dimples import Document
 from dimples import DocumentUtils
 from dimples import CommonFacebook
 from dimples import AccountDBI, MessageDBI, SessionDBI
+from dimples import CommonMessenger
 from dimples.group import SharedGroupManager
 from dimples.client import ClientChecker
 from dimples.client import ClientSession, ClientMessenger
@@ -40,12 +45,15 @@ from dimples.client import Terminal
 
 from libs.utils import Path, Config
 from libs.utils import Singleton
+from libs.utils import Runner
 from libs.database import Database
 
 from libs.client import LibraryLoader
 from libs.client import ClientArchivist
 from libs.client import ClientPacker
 from libs.client import Emitter
+from libs.client import UploadManager
+from libs.client import CryptoManager
 
 
 @Singleton
@@ -127,6 +135,14 @@ class GlobalVariable:
         #
         facebook = await create_facebook(database=database)
         self.__facebook = facebook
+        #
+        #  Step 3: file cache & uploader
+        #
+        UploadManager().config = config
+        #
+        #  Step 4: crypto pool for incoming messages
+        #
+        CryptoManager().config = config
 
     async def login(self, current_user: ID):
         facebook = self.facebook
@@ -255,6 +271,131 @@ class BotClient(Terminal):
     # Override
     def _create_messenger(self, facebook: ClientFacebook, session: ClientSession) -> ClientMessenger:
         shared = GlobalVariable()
-        messenger = ClientMessenger(session=session, facebook=facebook, database=shared.mdb)
+        messenger = BotMessenger(session=session, facebook=facebook, database=shared.mdb)
         shared.messenger = messenger
         return messenger
+
+
+class BotMessenger(ClientMessenger):
+    """ Suspend messages while the session is not ready, resend them after handshake;
+        verify & decrypt incoming messages in the crypto pool when configured
+    """
+
+    RESEND_BATCH = 64       # messages for each round
+    RESEND_INTERVAL = 1.0   # seconds between rounds
+
+    def __init__(self, session: ClientSession, facebook: ClientFacebook, database: MessageDBI):
+        super().__init__(session=session, facebook=facebook, database=database)
+        self.__resending = False
+        # messages processed later, receipts will be built after processed
+        self.__deferred: Set[int] = set()
+
+    def defer_receipt(self, msg: ReliableMessage):
+        """ the message will be processed later, don't respond receipt now """
+        self.__deferred.add(id(msg))
+
+    async def build_receipt(self, msg: ReliableMessage) -> Optional[ReliableMessage]:
+        """ receipt for the deferred message if nothing responded after processed """
+        if self._needs_receipt(msg=msg):
+            return await self._build_receipt(envelope=msg.envelope)
+
+    # Override
+    def _needs_receipt(self, msg: ReliableMessage) -> bool:
+        if id(msg) in self.__deferred:
+            self.__deferred.discard(id(msg))
+            return False
+        return super()._needs_receipt(msg=msg)
+
+    # Override
+    async def send_instant_message(self, msg: InstantMessage, priority: int = 0) -> Optional[ReliableMessage]:
+        if self.session.ready or isinstance(msg.content, Command):
+            return await super().send_instant_message(msg=msg, priority=priority)
+        # encrypt & sign it now, the reliable message will be suspended
+        return await CommonMessenger.send_instant_message(self, msg=msg, priority=priority)
+
+    # Override
+    async def send_reliable_message(self, msg: ReliableMessage, priority: int = 0) -> bool:
+        if self.session.ready or msg.get('pass') == 'handshaking':
+            return await super().send_reliable_message(msg=msg, priority=priority)
+        self.warning(msg='session not ready, suspend message: %s => %s' % (msg.sender, msg.receiver))
+        return await self.database.cache_reliable_message(msg=msg, receiver=msg.receiver)
+
+    # Override
+    async def verify_data_signature(self, data: bytes, signature: bytes, msg: ReliableMessage) -> bool:
+        pool = CryptoManager().pool
+        if pool is None:
+            return await super().verify_data_signature(data=data, signature=signature, msg=msg)
+        sender = msg.sender
+        facebook = self.facebook
+        meta = await facebook.get_meta(identifier=sender)
+        if meta is None:
+            return await super().verify_data_signature(data=data, signature=signature, msg=msg)
+        docs = await facebook.get_documents(identifier=sender)
+        keys = DefaultVisaAgent().get_verify_keys(meta=meta, documents=docs)
+        try:
+            return await pool.verify(sender=str(sender), keys=[key.to_dict() for key in keys],
+                                     data=data, signature=signature)
+        except Exception as error:
+            self.error(msg='failed to verify message in pool: %s, %s' % (sender, error))
+            return await super().verify_data_signature(data=data, signature=signature, msg=msg)
+
+    # Override
+    async def decrypt_key(self, bundle: EncryptedBundle, receiver: ID, msg: SecureMessage) -> Optional[bytes]:
+        pool = CryptoManager().pool
+        if pool is None:
+            return await super().decrypt_key(bundle=bundle, receiver=receiver, msg=msg)
+        facebook = self.facebook
+        keys = []
+        ciphertexts = []
+        dictionary = bundle.to_dict()
+        for terminal in dictionary:
+            uid = receiver
+            if terminal is not None and len(terminal) > 0 and terminal != '*':
+                uid = ID.create(name=receiver.name, address=receiver.address, terminal=terminal)
+            for key in await facebook.private_keys_for_decryption(identifier=uid):
+                info = key.to_dict()
+                if info not in keys:
+                    keys.append(info)
+            ciphertexts.append(dictionary[terminal])
+        try:
+            return await pool.decrypt(sender=str(msg.sender), keys=keys, ciphertexts=ciphertexts)
+        except Exception as error:
+            self.error(msg='failed to decrypt message key in pool: %s, %s' % (msg.sender, error))
+            return await super().decrypt_key(bundle=bundle, receiver=receiver, msg=msg)
+
+    # Override
+    async def handshake_success(self):
+        await super().handshake_success()
+        if not self.__resending:
+            self.__resending = True
+            Runner.async_task(coro=self._resend_messages())
+
+    async def _resend_messages(self):
+        """ send suspended messages in batches, stop when the session lost again """
+        shared = GlobalVariable()
+        database = shared.database
+        section = shared.config.get_section(section='outbox')
+        batch = None if section is None else section.get('batch')
+        batch = self.RESEND_BATCH if batch is None else int(batch)
+        interval = None if section is None else section.get('interval')
+        interval = self.RESEND_INTERVAL if interval is None else float(interval)
+        sent = 0
+        try:
+            for receiver in await database.get_outbox_receivers():
+                while self.session.ready:
+                    messages = await database.get_reliable_messages(receiver=receiver, limit=batch)
+                    if len(messages) == 0:
+                        break
+                    for msg in messages:
+                        if not await super().send_reliable_message(msg=msg, priority=1):
+                            self.warning(msg='failed to resend message: %s => %s' % (msg.sender, receiver))
+                            return
+                        await database.remove_reliable_message(msg=msg, receiver=receiver)
+                        sent += 1
+                    await asyncio.sleep(interval)
+        except Exception as error:
+            self.error(msg='failed to resend messages: %s' % error)
+        finally:
+            self.__resending = False
+            if sent > 0:
+                self.info(msg='resent %d suspended messages' % sent)
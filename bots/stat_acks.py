@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Ingest Acknowledgement
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Stations may tag their logs with sequence numbers:
+
+        {
+            "app"    : "chat.dim.monitor",
+            "mod"    : "batch",    // or 'users', 'stats', 'speeds'
+            "sn"     : 123,        // per-station sequence number, starts from 1
+            "session": "...",      // optional, changed when the station restarts
+            ...
+        }
+
+    after the records were saved by the recorder, the bot responds a
+    cumulative ack with the missing sequence numbers periodically,
+    the cumulative acks are kept in file, so a restarted bot won't
+    acknowledge the logs lost from its queue:
+
+        {
+            "app"    : "chat.dim.monitor",
+            "mod"    : "ack",
+            "act"    : "respond",
+            "ack"    : 120,           // all logs with sn <= 120 were saved
+            "gaps"   : [[122, 122]],  // sn ranges not received (or failed to save)
+            "session": "..."
+        }
+"""
+
+import threading
+from typing import Optional, Tuple, Set, List, Dict
+
+from dimples import ID
+from dimples import CustomizedContent
+
+from dimples.utils import Singleton, Logging
+from dimples.utils import Runner
+from dimples.database import Storage
+
+from libs.client import Emitter
+
+
+class AckTicket:
+    """ Records from one log content """
+
+    __slots__ = ('station', 'sn', 'count', 'saved', 'failed')
+
+    def __init__(self, station: str, sn: int, count: int):
+        super().__init__()
+        self.station = station
+        self.sn = sn
+        self.count = count    # records not finished
+        self.saved = set()    # indexes of records saved
+        self.failed = False
+
+    # Override
+    def __str__(self) -> str:
+        return '<AckTicket station="%s" sn=%d count=%d />' % (self.station, self.sn, self.count)
+
+
+class AckState:
+    """ Sequence numbers from one station """
+
+    # how far the cumulative ack can be behind the highest sn,
+    # logs older than this are not kept by the station any more
+    WINDOW = 65536
+
+    def __init__(self, identifier: ID, session: Optional[str], acked: int = 0):
+        super().__init__()
+        self.identifier = identifier
+        self.session = session
+        self.acked = acked   # cumulative
+        self.highest = acked
+        self.pending: Dict[int, AckTicket] = {}
+        self.persisted: Set[int] = set()
+        # sn => indexes of records saved, for logs failed to save
+        self.partial: Dict[int, Set[int]] = {}
+        self.dirty = False
+
+    def receive(self, sn: int, count: int) -> Optional[AckTicket]:
+        """ return None for duplicated log """
+        if sn <= self.acked or sn in self.pending or sn in self.persisted:
+            return None
+        if sn > self.highest:
+            self.highest = sn
+        ticket = AckTicket(station=str(self.identifier), sn=sn, count=count)
+        saved = self.partial.pop(sn, None)
+        if saved is not None:
+            # sent again after failed, skip the records saved last time
+            ticket.saved = saved
+            ticket.count -= len(saved)
+        if ticket.count > 0:
+            self.pending[sn] = ticket
+        else:
+            self.persisted.add(sn)
+            self._advance()
+        return ticket
+
+    def finish(self, ticket: AckTicket, index: int, ok: bool):
+        if self.pending.get(ticket.sn) is not ticket:
+            # reset by new session
+            return
+        if ok:
+            ticket.saved.add(index)
+        else:
+            ticket.failed = True
+        ticket.count -= 1
+        if ticket.count > 0:
+            return
+        self.pending.pop(ticket.sn, None)
+        if ticket.failed:
+            # report as gap, let the station send it again
+            self.partial[ticket.sn] = ticket.saved
+            self.dirty = True
+            return
+        self.persisted.add(ticket.sn)
+        self._advance()
+
+    def _advance(self):
+        acked = self.acked
+        floor = self.highest - self.WINDOW
+        if acked < floor:
+            # give up the gaps too far behind
+            acked = floor
+            self.persisted = set(sn for sn in self.persisted if sn > acked)
+            self.partial = {sn: saved for sn, saved in self.partial.items() if sn > acked}
+        while acked + 1 in self.persisted:
+            acked += 1
+            self.persisted.discard(acked)
+        self.acked = acked
+        self.dirty = True
+
+    def gaps(self, limit: int = 64) -> List[Tuple[int, int]]:
+        """ sn ranges neither saved nor pending """
+        ranges = []
+        start = None
+        end = self.highest
+        for sn in range(self.acked + 1, end + 1):
+            if sn in self.persisted or sn in self.pending:
+                if start is not None:
+                    ranges.append((start, sn - 1))
+                    start = None
+                    if len(ranges) >= limit:
+                        return ranges
+            elif start is None:
+                start = sn
+        if start is not None:
+            ranges.append((start, end))
+        return ranges
+
+
+@Singleton
+class AckTracker(Logging):
+    """ Track log sequence numbers from stations """
+
+    def __init__(self):
+        super().__init__()
+        self.__lock = threading.Lock()
+        # station => state
+        self.__states: Dict[str, AckState] = {}
+        # station => (session, acked), loaded from last running
+        self.__stored: Dict[str, Tuple[Optional[str], int]] = {}
+        self.__path: Optional[str] = None
+
+    async def load(self, path: str):
+        """ restore cumulative acks, so the logs lost in last running will not be acknowledged """
+        self.__path = path
+        container = await Storage.read_json(path=path)
+        if not isinstance(container, Dict):
+            return
+        with self.__lock:
+            for station, info in container.items():
+                acked = info.get('acked')
+                if isinstance(acked, int):
+                    self.__stored[station] = (info.get('session'), acked)
+        self.info(msg='loaded acks for %d stations: %s' % (len(self.__stored), path))
+
+    async def save(self) -> bool:
+        path = self.__path
+        if path is None:
+            return False
+        with self.__lock:
+            container = {station: {'session': session, 'acked': acked}
+                         for station, (session, acked) in self.__stored.items()}
+            for station, state in self.__states.items():
+                container[station] = {'session': state.session, 'acked': state.acked}
+        return await Storage.write_json(container=container, path=path)
+
+    def receive(self, station: ID, sn: int, count: int, session: Optional[str] = None) -> Optional[AckTicket]:
+        """ register a log content, return None for duplicated log """
+        with self.__lock:
+            state = self.__states.get(str(station))
+            if state is None or state.session != session:
+                # nothing acknowledged for a new session (sn starts from 1)
+                acked = 0
+                stored = self.__stored.pop(str(station), None)
+                if stored is not None and stored[0] == session:
+                    acked = stored[1]
+                state = AckState(identifier=station, session=session, acked=acked)
+                self.__states[str(station)] = state
+            ticket = state.receive(sn=sn, count=count)
+            if ticket is None:
+                # respond ack again for duplicated log
+                state.dirty = True
+            return ticket
+
+    def finish(self, records: List, ok: bool):
+        """ called by recorder after the records saved (or failed) """
+        with self.__lock:
+            for rec in records:
+                ticket = rec.ticket
+                if ticket is None:
+                    continue
+                state = self.__states.get(ticket.station)
+                if state is not None:
+                    state.finish(ticket=ticket, index=rec.index, ok=ok)
+
+    def pop_acks(self) -> List[Tuple[ID, int, List[Tuple[int, int]], Optional[str]]]:
+        """ [(station, acked, gaps, session)] changed since last time """
+        acks = []
+        with self.__lock:
+            for state in self.__states.values():
+                if not state.dirty:
+                    continue
+                state.dirty = False
+                acks.append((state.identifier, state.acked, state.gaps(), state.session))
+        return acks
+
+
+class AckSender(Runner, Logging):
+    """ Respond acks to stations periodically """
+
+    ACK_INTERVAL = 10  # seconds
+
+    def __init__(self):
+        super().__init__(interval=self.ACK_INTERVAL)
+
+    def start(self):
+        Runner.async_task(coro=self.run())
+
+    # Override
+    async def process(self) -> bool:
+        emitter = Emitter()
+        tracker = AckTracker()
+        acks = tracker.pop_acks()
+        if len(acks) > 0:
+            # keep what will be acknowledged before responding
+            await tracker.save()
+        for station, acked, gaps, session in acks:
+            content = CustomizedContent.create(app='chat.dim.monitor', mod='ack', act='respond')
+            content['ack'] = acked
+            content['gaps'] = [[start, end] for start, end in gaps]
+            if session is not None:
+                content['session'] = session
+            self.info(msg='respond ack to %s: %d, gaps: %s' % (station, acked, gaps))
+            try:
+                await emitter.send_content(content=content, receiver=station)
+            except Exception as error:
+                self.error(msg='failed to respond ack to %s: %s' % (station, error))
+        # have a rest until next round
+        return False
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Latency Regression Detector
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Keep a baseline for each station from the speeds records as they arrive:
+
+        * EWMA of response times
+        * p90 from a log-bucket histogram (decayed, so old samples fade out)
+
+    recent samples are collected in another histogram; every N samples, the
+    recent p90 is compared with the baseline p90, then merged into baseline.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+from bots.stat_records import SpeedsRecord
+
+
+class LogHistogram:
+    """ Log-bucket sketch for percentiles, error < (BASE - 1) """
+
+    MIN_VALUE = 0.001  # 1 ms
+    BASE = 1.2
+    BUCKETS = 64       # 0.001 * 1.2 ** 64 ~= 117 seconds
+
+    def __init__(self):
+        super().__init__()
+        self.counts = array('d', [0.0] * self.BUCKETS)
+        self.total = 0.0
+
+    @classmethod
+    def _index(cls, value: float) -> int:
+        if value <= cls.MIN_VALUE:
+            return 0
+        index = int(math.log(value / cls.MIN_VALUE, cls.BASE)) + 1
+        return min(index, cls.BUCKETS - 1)
+
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """ upper bound of bucket """
+        return cls.MIN_VALUE * (cls.BASE ** index)
+
+    def add(self, value: float):
+        self.counts[self._index(value=value)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            counts[i] += c
+        self.total += other.total
+
+    def decay(self, factor: float):
+        counts = self.counts
+        for i in range(len(counts)):
+            counts[i] *= factor
+        self.total *= factor
+
+    def clear(self):
+        counts = self.counts
+        for i in range(len(counts)):
+            counts[i] = 0.0
+        self.total = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self.total <= 0:
+            return None
+        rank = self.total * q
+        seen = 0.0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self._value(index=i)
+        return self._value(index=self.BUCKETS - 1)
+
+
+class LatencyAlert:
+    """ Station regressed """
+
+    __slots__ = ('station', 'recent_p90', 'baseline_p90', 'ewma', 'samples', 'time')
+
+    def __init__(self, station: str, recent_p90: float, baseline_p90: float, ewma: float, samples: int):
+        super().__init__()
+        self.station = station
+        self.recent_p90 = recent_p90
+        self.baseline_p90 = baseline_p90
+        self.ewma = ewma
+        self.samples = samples
+        self.time = time.time()
+
+    # Override
+    def __str__(self) -> str:
+        return 'Station "%s" latency regressed: p90 %.3fs (baseline %.3fs), EWMA %.3fs, samples: %d' \
+               % (self.station, self.recent_p90, self.baseline_p90, self.ewma, self.samples)
+
+
+class StationBaseline:
+
+    def __init__(self):
+        super().__init__()
+        self.ewma: Optional[float] = None
+        self.samples = 0
+        self.last_time = 0.0
+        self.baseline = LogHistogram()
+        self.recent = LogHistogram()
+
+
+class LatencyDetector:
+    """ Streaming detector for station latency regression """
+
+    ALPHA = 0.02            # smoothing factor for baseline EWMA
+    RECENT_SAMPLES = 50     # compare recent p90 with baseline every N samples
+    MIN_BASELINE = 200      # samples needed before alerting
+    DECAY = 0.98            # baseline decay after each round
+    RATIO = 2.0             # recent p90 > baseline p90 * RATIO
+    MIN_DELTA = 0.1         # and grows more than 100 ms
+
+    MAX_STATIONS = 4096     # station names come from client logs
+    IDLE_EXPIRES = 3600 * 24  # forget stations without samples for a day
+
+    def __init__(self):
+        super().__init__()
+        self.__lock = threading.Lock()
+        # station => baseline, least recently updated first
+        self.__stations: Dict[str, StationBaseline] = OrderedDict()
+        self.__alerts: List[LatencyAlert] = []
+
+    def add(self, record: SpeedsRecord):
+        with self.__lock:
+            for station, response_time in zip(record.stations, record.response_times):
+                if response_time > 0:
+                    self._add_sample(station=station, value=response_time)
+
+    def _add_sample(self, station: str, value: float):
+        stations = self.__stations
+        info = stations.get(station)
+        now = time.time()
+        if info is None:
+            self._evict(now=now)
+            info = StationBaseline()
+            stations[station] = info
+        else:
+            stations.move_to_end(station)
+        info.last_time = now
+        if info.ewma is None:
+            info.ewma = value
+        else:
+            info.ewma += self.ALPHA * (value - info.ewma)
+        info.samples += 1
+        recent = info.recent
+        recent.add(value=value)
+        if recent.total < self.RECENT_SAMPLES:
+            return
+        # check recent samples
+        baseline = info.baseline
+        if baseline.total >= self.MIN_BASELINE:
+            recent_p90 = recent.percentile(q=0.9)
+            baseline_p90 = baseline.percentile(q=0.9)
+            if recent_p90 > baseline_p90 * self.RATIO and recent_p90 - baseline_p90 > self.MIN_DELTA:
+                self.__alerts.append(LatencyAlert(station=station, recent_p90=recent_p90, baseline_p90=baseline_p90,
+                                                  ewma=info.ewma, samples=info.samples))
+        # merge into baseline
+        baseline.decay(factor=self.DECAY)
+        baseline.merge(recent)
+        recent.clear()
+
+    def _evict(self, now: float):
+        """ remove idle stations, and the least recently updated ones when full """
+        stations = self.__stations
+        expired = now - self.IDLE_EXPIRES
+        while len(stations) > 0:
+            name, info = next(iter(stations.items()))
+            if info.last_time >= expired and len(stations) < self.MAX_STATIONS:
+                break
+            stations.pop(name)
+
+    def pop_alerts(self) -> List[LatencyAlert]:
+        with self.__lock:
+            alerts = self.__alerts
+            self.__alerts = []
+            return alerts
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Statistic Export
+    ~~~~~~~~~~~~~~~~
+
+    Stream rows from the log files into a compressed file, one day at a time,
+    so memory stays flat however long the range is.
+"""
+
+import asyncio
+import csv
+import gzip
+import json
+import time
+from typing import Optional, Tuple, List, Dict
+from typing import AsyncIterator
+
+from bots.stat_recoder import g_recorder
+
+
+# max days for one export
+MAX_DAYS = 31
+
+# rows to write before giving the event loop a turn
+YIELD_ROWS = 4096
+
+EXPORT_FORMATS = ['csv', 'ndjson']
+
+EXPORT_COLUMNS = {
+    'users': ['time', 'user', 'ip'],
+    'stats': ['time', 'sender_type', 'msg_type', 'count'],
+    'speeds': ['time', 'user', 'provider', 'station', 'client', 'response_time'],
+}
+
+
+def parse_range(text: str) -> Tuple[Optional[List[float]], str]:
+    """ get days from '{yyyy-mm-dd}' or '{yyyy-mm-dd}..{yyyy-mm-dd}', return (None, error) on failure """
+    text = text.strip()
+    if len(text) == 0:
+        text = time.strftime('%Y-%m-%d', time.localtime(time.time()))
+    pos = text.find('..')
+    if pos < 0:
+        start, end = text, text
+    else:
+        start, end = text[:pos], text[pos+2:]
+    try:
+        first = time.strptime(start, '%Y-%m-%d')
+        last = time.mktime(time.strptime(end, '%Y-%m-%d'))
+    except ValueError as e:
+        return None, 'error date: %s, %s' % (text, e)
+    days = []
+    for offset in range(MAX_DAYS + 1):
+        # let mktime normalize the day of month
+        day = time.mktime((first.tm_year, first.tm_mon, first.tm_mday + offset, 0, 0, 0, 0, 0, -1))
+        if day > last:
+            break
+        days.append(day)
+    if len(days) == 0:
+        return None, 'error range: %s' % text
+    elif len(days) > MAX_DAYS:
+        return None, 'range too long: %s, max days: %d' % (text, MAX_DAYS)
+    return days, text
+
+
+def _users_row(tag: str, item) -> Optional[List]:
+    if isinstance(item, Dict):
+        ip_list = item.get('IP')
+        if isinstance(ip_list, List):
+            ip_list = ' '.join([str(ip) for ip in ip_list])
+        return [tag, item.get('U'), ip_list]
+    elif isinstance(item, str):
+        return [tag, item, None]
+
+
+def _stats_row(tag: str, item) -> Optional[List]:
+    if isinstance(item, Dict):
+        return [tag, item.get('S'), item.get('T'), item.get('C')]
+
+
+def _speeds_row(tag: str, item) -> Optional[List]:
+    if isinstance(item, Dict):
+        return [tag, item.get('U'), item.get('provider'), item.get('station'), item.get('client'),
+                item.get('response_time')]
+
+
+_ROW_BUILDERS = {
+    'users': _users_row,
+    'stats': _stats_row,
+    'speeds': _speeds_row,
+}
+
+
+async def export_rows(kind: str, days: List[float]) -> AsyncIterator[List]:
+    """ rows of the log files, loading one day at a time """
+    builder = _ROW_BUILDERS[kind]
+    option = '%s_log' % kind
+    for now in days:
+        async for tag, item in g_recorder.iter_items(option=option, now=now):
+            row = builder(tag, item)
+            if row is not None:
+                yield row
+
+
+async def export_file(kind: str, days: List[float], fmt: str, path: str) -> int:
+    """ write rows into a gzip file, return count of rows """
+    columns = EXPORT_COLUMNS[kind]
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            write = writer.writerow
+        else:
+            assert fmt == 'ndjson', 'export format error: %s' % fmt
+
+            def write(values: List):
+                file.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                file.write('\n')
+        async for row in export_rows(kind=kind, days=days):
+            write(row)
+            count += 1
+            if count % YIELD_ROWS == 0:
+                await asyncio.sleep(0)
+    return count
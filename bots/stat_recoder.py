@@ -64,6 +64,24 @@
                 ]
             }
 
+        when "speeds_sampling" is set, only a reservoir of speeds is kept for
+        each (station, hour), with summary for all measurements:
+
+            {
+                "sampled": true,
+                "summary": {
+                    "yyyy-mm-dd HH:00 host:port": {
+                        "count": 1000,
+                        "sum"  : 125.0,
+                        "min"  : 0.01,
+                        "max"  : 2.5
+                    }
+                },
+                "yyyy-mm-dd HH:00 host:port": [
+                    // same items as above
+                ]
+            }
+
     Fields:
         'S' - Sender type
         'C' - Counter
@@ -77,11 +95,12 @@
         https://github.com/dimchat/dkd-py/blob/master/dkd/protocol/types.py
 """
 
+import random
 import threading
 from typing import Optional, Tuple, Set, List, Dict
+from typing import AsyncIterator
 
 from dimples import DateTime
-from dimples import CustomizedContent
 
 from dimples.database import Storage
 
@@ -91,15 +110,33 @@ from dimples.utils import Runner
 
 from libs.utils import parse_time
 
+from bots.stat_records import pack_ip
+from bots.stat_records import StatRecord, UsersRecord, StatsRecord, SpeedsRecord
+from bots.stat_records import UserInfo, SpeedInfo
+from bots.stat_acks import AckTracker
+from bots.stat_window import RollingWindow
+from bots.stat_detector import LatencyDetector
+
 
 @Singleton
 class StatRecorder(Runner, Logging):
 
+    # max records to be saved in one round
+    BATCH_LIMIT = 4096
+
+    # size of rolling window for live counters
+    LIVE_MINUTES = 15
+
     def __init__(self):
         super().__init__(interval=Runner.INTERVAL_SLOW)
         self.__lock = threading.Lock()
-        self.__contents: List[CustomizedContent] = []
+        self.__records: List[StatRecord] = []
         self.__config: Config = None
+        # live counters
+        self.__window = RollingWindow(minutes=self.LIVE_MINUTES)
+        self.__detector = LatencyDetector()
+        # reservoir size for speeds, 0 means saving all
+        self.__speeds_sampling = 0
 
     @property
     def config(self) -> Optional[Config]:
@@ -108,6 +145,17 @@ class StatRecorder(Runner, Logging):
     @config.setter
     def config(self, conf: Config):
         self.__config = conf
+        section = conf.get_section(section='statistic')
+        minutes = None if section is None else section.get('live_minutes')
+        if minutes is not None and int(minutes) != self.__window.minutes:
+            self.__window = RollingWindow(minutes=int(minutes))
+        sampling = None if section is None else section.get('speeds_sampling')
+        self.__speeds_sampling = 0 if sampling is None else int(sampling)
+
+    @property
+    def window(self) -> RollingWindow:
+        """ live counters for the last N minutes """
+        return self.__window
 
     def _get_path(self, option: str, msg_time: float) -> str:
         temp = self.__config.get_string(section='statistic', option=option)
@@ -115,22 +163,36 @@ class StatRecorder(Runner, Logging):
         year, month, day, _, _ = parse_time(msg_time=msg_time)
         return temp.replace('{yyyy}', year).replace('{mm}', month).replace('{dd}', day)
 
-    def add_log(self, content: CustomizedContent):
+    @property
+    def detector(self) -> LatencyDetector:
+        """ latency regression detector for stations """
+        return self.__detector
+
+    def add_record(self, record: StatRecord):
+        self.__window.add(record=record)
+        if isinstance(record, SpeedsRecord):
+            self.__detector.add(record=record)
+        with self.__lock:
+            self.__records.append(record)
+
+    def add_records(self, records: List[StatRecord]):
+        window = self.__window
+        detector = self.__detector
+        for rec in records:
+            window.add(record=rec)
+            if isinstance(rec, SpeedsRecord):
+                detector.add(record=rec)
         with self.__lock:
-            self.__contents.append(content)
+            self.__records.extend(records)
 
-    def _next(self) -> Optional[CustomizedContent]:
+    def _next_records(self, limit: int) -> List[StatRecord]:
         with self.__lock:
-            if len(self.__contents) > 0:
-                return self.__contents.pop(0)
+            records = self.__records[:limit]
+            self.__records = self.__records[limit:]
+            return records
 
-    async def _save_users(self, msg_time: float, users: List[Dict]):
-        log_path = self._get_path(msg_time=msg_time, option='users_log')
-        container: Dict = await Storage.read_json(path=log_path)
-        if container is None:
-            container = {}
-        year, month, day, hours, minutes = parse_time(msg_time=msg_time)
-        log_tag = '%s-%s-%s %s:%s' % (year, month, day, hours, minutes)
+    @classmethod
+    def _merge_users(cls, container: Dict, log_tag: str, items: List[Tuple[str, Optional[str]]]):
         array: List[Dict] = container.get(log_tag)
         # convert List to Set
         records: Set[Tuple[str, Optional[str]]] = set()
@@ -156,15 +218,8 @@ class StatRecorder(Runner, Logging):
                     for ip in ips:
                         records.add((uid, ip))
         # add new users
-        for item in users:
-            if isinstance(item, Dict):
-                uid = item.get('U')
-                ip = item.get('IP')  # str
-            else:
-                assert isinstance(item, str), 'new user item error: %s' % item
-                uid = item
-                ip = None
-            records.add((uid, ip))
+        for item in items:
+            records.add(item)
         # convert Set to Dict
         table: Dict[str, Set[str]] = {}
         for item in records:
@@ -186,64 +241,122 @@ class StatRecorder(Runner, Logging):
                 'IP': list(ips)
             })
         container[log_tag] = array
-        # update log file
-        return await Storage.write_json(container=container, path=log_path)
 
-    async def _save_stats(self, msg_time: float, stats: List[Dict]):
-        log_path = self._get_path(msg_time=msg_time, option='stats_log')
-        container: Dict = await Storage.read_json(path=log_path)
-        if container is None:
-            container = {}
-        year, month, day, hours, minutes = parse_time(msg_time=msg_time)
-        log_tag = '%s-%s-%s %s:%s' % (year, month, day, hours, minutes)
-        array = container.get(log_tag)
-        if array is None:
-            array = []
-            container[log_tag] = array
-        # append records
-        for item in stats:
-            array.append(item)
-        # update log file
-        return await Storage.write_json(container=container, path=log_path)
-
-    async def _save_speeds(self, msg_time: float, sender: str,
-                           provider: str, stations: List[Dict], client: Optional[str]):
-        log_path = self._get_path(msg_time=msg_time, option='speeds_log')
-        container: Dict = await Storage.read_json(path=log_path)
-        if container is None:
-            container = {}
-        year, month, day, hours, minutes = parse_time(msg_time=msg_time)
-        log_tag = '%s-%s-%s %s:%s' % (year, month, day, hours, minutes)
+    @classmethod
+    def _append_items(cls, container: Dict, log_tag: str, items: List[Dict]):
         array = container.get(log_tag)
         if array is None:
             array = []
             container[log_tag] = array
-        # append speeds
-        for srv in stations:
-            host = srv.get('host')
-            port = srv.get('port')
-            response_time = srv.get('response_time')
-            socket_address = srv.get('socket_address')
-            if socket_address is not None:
-                client = socket_address
-            self.info(msg='station speed: %s' % srv)
-            item = {
-                'U': sender,
-                'provider': provider,
-                'station': '%s:%d' % (host, port),
-                'client': client,
-                'response_time': response_time,
-            }
-            array.append(item)
-        # update log file
-        return await Storage.write_json(container=container, path=log_path)
+        array.extend(items)
+
+    @classmethod
+    def _sample_items(cls, container: Dict, log_tag: str, items: List[Dict], size: int):
+        """ keep a reservoir of speeds for each (station, hour), and summary for all """
+        container['sampled'] = True
+        summary = container.get('summary')
+        if not isinstance(summary, Dict):
+            summary = {}
+            container['summary'] = summary
+        hour = log_tag[:13]  # 'yyyy-mm-dd HH'
+        for item in items:
+            response_time = item.get('response_time')
+            if response_time is None or response_time <= 0:
+                continue
+            tag = '%s:00 %s' % (hour, item.get('station'))
+            info = summary.get(tag)
+            if info is None:
+                info = {'count': 0, 'sum': 0.0, 'min': response_time, 'max': response_time}
+                summary[tag] = info
+            count = info['count'] + 1
+            info['count'] = count
+            info['sum'] += response_time
+            if response_time < info['min']:
+                info['min'] = response_time
+            if response_time > info['max']:
+                info['max'] = response_time
+            # reservoir sampling (algorithm R)
+            reservoir = container.get(tag)
+            if reservoir is None:
+                reservoir = []
+                container[tag] = reservoir
+            if len(reservoir) < size:
+                reservoir.append(item)
+            else:
+                pos = random.randrange(count)
+                if pos < size:
+                    reservoir[pos] = item
+
+    async def _save_records(self, records: List[StatRecord]) -> Tuple[List[StatRecord], List[StatRecord]]:
+        """ group records by log files, read & write each file once; return (saved, failed) """
+        # log_path => (option, log_tag => items, records)
+        groups: Dict[str, Tuple[str, Dict[str, List], List[StatRecord]]] = {}
+        saved = []
+        failed = []
+        for rec in records:
+            if isinstance(rec, UsersRecord):
+                option = 'users_log'
+            elif isinstance(rec, StatsRecord):
+                option = 'stats_log'
+            elif isinstance(rec, SpeedsRecord):
+                option = 'speeds_log'
+            else:
+                self.warning(msg='ignore record: %s' % rec)
+                # nothing to save, finish it
+                saved.append(rec)
+                continue
+            try:
+                msg_time = rec.time
+                log_path = self._get_path(msg_time=msg_time, option=option)
+                year, month, day, hours, minutes = parse_time(msg_time=msg_time)
+                log_tag = '%s-%s-%s %s:%s' % (year, month, day, hours, minutes)
+                items = rec.items()
+            except Exception as e:
+                self.error(msg='failed to prepare record: %s, %s' % (rec, e))
+                failed.append(rec)
+                continue
+            group = groups.get(log_path)
+            if group is None:
+                group = (option, {}, [])
+                groups[log_path] = group
+            group[2].append(rec)
+            tags = group[1]
+            array = tags.get(log_tag)
+            if array is None:
+                array = []
+                tags[log_tag] = array
+            array.extend(items)
+        # update log files
+        sampling = self.__speeds_sampling
+        for log_path in groups:
+            option, tags, array = groups[log_path]
+            ok = False
+            try:
+                container: Dict = await Storage.read_json(path=log_path)
+                if container is None:
+                    container = {}
+                for log_tag in tags:
+                    if option == 'users_log':
+                        self._merge_users(container=container, log_tag=log_tag, items=tags[log_tag])
+                    elif option == 'speeds_log' and sampling > 0:
+                        self._sample_items(container=container, log_tag=log_tag, items=tags[log_tag], size=sampling)
+                    else:
+                        self._append_items(container=container, log_tag=log_tag, items=tags[log_tag])
+                ok = await Storage.write_json(container=container, path=log_path)
+            except Exception as e:
+                self.error(msg='failed to save records: %s, %s' % (log_path, e))
+            if ok:
+                saved.extend(array)
+            else:
+                failed.extend(array)
+        return saved, failed
 
-    async def get_users(self, now: float) -> List[Dict]:
+    async def get_users(self, now: float) -> List[UserInfo]:
         log_path = self._get_path(msg_time=now, option='users_log')
         container = await Storage.read_json(path=log_path)
         if container is None:
             return []
-        users: List[Dict] = []
+        users: Dict[str, UserInfo] = {}
         for tag in container:
             array: List[Dict] = container.get(tag)
             if array is None or len(array) == 0:
@@ -260,37 +373,30 @@ class StatRecorder(Runner, Logging):
                     self.error('user item error: %s' % item)
                     continue
                 # seek user result
-                result: Dict = None
-                for res in users:
-                    if res.get('U') == user_id:
-                        # got it
-                        result = res
-                        break
+                result = users.get(user_id)
                 if result is None:
-                    result = {
-                        'U': user_id,
-                        'IP': set(),
-                    }
-                    users.append(result)
+                    result = UserInfo(sender=user_id)
+                    users[user_id] = result
                 # client ip
                 if isinstance(ip_list, List):
-                    ips: Set = result['IP']
                     for ip in ip_list:
-                        ips.add(ip)
+                        result.ips.add(pack_ip(ip=ip))
                 elif isinstance(ip_list, str):
-                    ips: Set = result['IP']
-                    ips.add(ip_list)
-        return users
+                    result.ips.add(pack_ip(ip=ip_list))
+        return list(users.values())
 
-    async def get_speeds(self, now: float) -> List[Dict]:
+    async def get_speeds(self, now: float) -> Tuple[List[SpeedInfo], Optional[Dict[str, Dict]]]:
+        """ speeds, with summary for each (station, hour) if the speeds were sampled """
         log_path = self._get_path(msg_time=now, option='speeds_log')
         container = await Storage.read_json(path=log_path)
         if container is None:
-            return []
-        speeds: List[Dict] = []
+            return [], None
+        # (station, client_ip, sender, provider) => result
+        speeds: Dict[Tuple, SpeedInfo] = {}
         for tag in container:
             array: List[Dict] = container.get(tag)
-            if array is None or len(array) == 0:
+            if not isinstance(array, List) or len(array) == 0:
+                # skip 'sampled' & 'summary'
                 continue
             for item in array:
                 sender = item.get('U')
@@ -305,35 +411,32 @@ class StatRecorder(Runner, Logging):
                     client = client.split(':')[0]
                 elif isinstance(client, List):
                     client = client[0]
+                client = pack_ip(ip=client)
                 # seek speed result
-                result: Dict = None
-                for res in speeds:
-                    if res.get('station') != station or res.get('client_ip') != client:
-                        continue
-                    pid = res.get('provider')
-                    if pid is not None and pid != provider:
-                        continue
-                    uid = res.get('U')
-                    if uid is not None and uid != sender:
-                        continue
-                    # got it
-                    result = res
-                    break
+                key = (station, client, sender, provider)
+                result = speeds.get(key)
                 if result is None:
-                    result = {
-                        'station': station,
-                        'client_ip': client,
-                        'rt': []
-                    }
-                    speeds.append(result)
-                if sender is not None:
-                    result['U'] = sender
-                if provider is not None:
-                    result['provider'] = provider
+                    result = SpeedInfo(station=station, client_ip=client)
+                    result.sender = sender
+                    result.provider = provider
+                    speeds[key] = result
                 # response times
-                rt = result['rt']
-                rt.append(response_time)
-        return speeds
+                result.rt.append(response_time)
+        summary = container.get('summary') if container.get('sampled') else None
+        return list(speeds.values()), summary
+
+    async def iter_items(self, option: str, now: float) -> AsyncIterator[Tuple[str, Dict]]:
+        """ (log_tag, item) from the log file of that day, skipping 'sampled' & 'summary' """
+        log_path = self._get_path(msg_time=now, option=option)
+        container = await Storage.read_json(path=log_path)
+        if container is None:
+            return
+        for tag in container:
+            array = container.get(tag)
+            if not isinstance(array, List):
+                continue
+            for item in array:
+                yield tag, item
 
     def start(self):
         thr = Runner.async_thread(coro=self.run())
@@ -341,38 +444,26 @@ class StatRecorder(Runner, Logging):
 
     # Override
     async def process(self) -> bool:
-        content = self._next()
-        if content is None:
+        records = self._next_records(limit=self.BATCH_LIMIT)
+        if len(records) == 0:
             # nothing to do now, return False to have a rest
             return False
-        now = DateTime.current_timestamp()
-        msg_time = content.time
-        msg_time = 0 if msg_time is None else msg_time.timestamp
-        if msg_time is None or msg_time < now - 3600*24*7:
-            self.warning(msg='message expired: %s' % content)
-            return True
-        try:
-            mod = content.module
-            if mod == 'users':
-                users = content.get('users')
-                await self._save_users(msg_time=msg_time, users=users)
-            elif mod == 'stats':
-                stats = content.get('stats')
-                await self._save_stats(msg_time=msg_time, stats=stats)
-            elif mod == 'speeds':
-                sender = content.get('U')
-                provider = content.get('provider')
-                stations = content.get('stations')
-                client = content.get('remote_address')
-                if isinstance(client, List):  # or isinstance(client, Tuple):
-                    assert len(client) == 2, 'socket address error: %s' % client
-                    client = '%s:%d' % (client[0], client[1])
-                await self._save_speeds(msg_time=msg_time, sender=sender,
-                                        provider=provider, stations=stations, client=client)
-            else:
-                self.warning(msg='ignore mod: %s, %s' % (mod, content))
-        except Exception as e:
-            self.error(msg='failed to process content: %s, %s' % (e, content))
+        expired = DateTime.current_timestamp() - 3600*24*7
+        array = []
+        skipped = []
+        for rec in records:
+            msg_time = rec.time
+            if msg_time is None or msg_time < expired:
+                self.warning(msg='message expired: %s' % rec)
+                skipped.append(rec)
+                continue
+            array.append(rec)
+        saved, failed = await self._save_records(records=array)
+        self.debug(msg='saved %d records, failed: %d, expired: %d' % (len(saved), len(failed), len(skipped)))
+        # acknowledge the stations
+        tracker = AckTracker()
+        tracker.finish(records=saved + skipped, ok=True)
+        tracker.finish(records=failed, ok=False)
         return True
 
 
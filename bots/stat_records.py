@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Compact Records
+    ~~~~~~~~~~~~~~~
+
+    Station logs are converted into these slotted records when they arrive,
+    so the recorder queue and the query results don't hold the whole content
+    dictionaries (with envelopes & string keys) in memory:
+
+        * ID, station & provider strings are interned
+        * IP addresses are packed into integers
+        * response times are kept in array('d')
+"""
+
+import sys
+import zlib
+from array import array
+from typing import Optional, Union, Tuple, Set, List, Dict
+
+from dimples import CustomizedContent
+
+from libs.utils import base64_decode, json_decode, utf8_decode
+from libs.utils import ip_to_int, int_to_ip
+
+
+def intern_str(text: Optional[str]) -> Optional[str]:
+    if isinstance(text, str):
+        return sys.intern(text)
+    elif text is not None:
+        return sys.intern(str(text))
+
+
+def _intern_value(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def pack_ip(ip: Optional[str]) -> Union[int, str, None]:
+    """ pack IP into integer, keep the origin string if it's not an IP """
+    if ip is None:
+        return None
+    value = ip_to_int(ip=ip)
+    if value is None:
+        return intern_str(ip)
+    return value
+
+
+def unpack_ip(value: Union[int, str, None]) -> Optional[str]:
+    if isinstance(value, int):
+        return int_to_ip(value=value)
+    return value
+
+
+def pack_address(address: Union[str, List, None]) -> Tuple[Union[int, str, None], int]:
+    """ pack socket address 'host:port' or [host, port] """
+    if address is None:
+        return None, 0
+    elif isinstance(address, List) or isinstance(address, Tuple):
+        assert len(address) == 2, 'socket address error: %s' % address
+        return pack_ip(ip=address[0]), int(address[1])
+    assert isinstance(address, str), 'socket address error: %s' % address
+    pos = address.rfind(':')
+    if pos > 0 and address[pos+1:].isdigit():
+        host = address[:pos]
+        if host.startswith('[') and host.endswith(']'):
+            host = host[1:-1]
+        return pack_ip(ip=host), int(address[pos+1:])
+    return pack_ip(ip=address), 0
+
+
+def unpack_address(ip: Union[int, str, None], port: int) -> Optional[str]:
+    host = unpack_ip(value=ip)
+    if host is None or port == 0:
+        return host
+    return '%s:%d' % (host, port)
+
+
+class StatRecord:
+    """ Base record """
+
+    __slots__ = ('time', 'ticket', 'index')
+
+    def __init__(self, msg_time: float):
+        super().__init__()
+        self.time = msg_time
+        self.ticket = None  # AckTicket
+        self.index = 0      # position in the log content
+
+    # Override
+    def __str__(self) -> str:
+        return '<%s time=%s />' % (self.__class__.__name__, self.time)
+
+    # Override
+    def __repr__(self) -> str:
+        return '<%s time=%s />' % (self.__class__.__name__, self.time)
+
+
+class UsersRecord(StatRecord):
+    """ Online users from station: [(uid, ip)] """
+
+    __slots__ = ('users', 'ips')
+
+    def __init__(self, msg_time: float, users: List):
+        super().__init__(msg_time=msg_time)
+        uids = []
+        ips = []
+        for item in users:
+            if isinstance(item, Dict):
+                uid = item.get('U')
+                ip = item.get('IP')  # str
+            else:
+                assert isinstance(item, str), 'new user item error: %s' % item
+                uid = item
+                ip = None
+            uids.append(intern_str(uid))
+            ips.append(pack_ip(ip=ip))
+        self.users: Tuple[str, ...] = tuple(uids)
+        self.ips: Tuple[Union[int, str, None], ...] = tuple(ips)
+
+    def items(self) -> List[Tuple[str, Optional[str]]]:
+        return [(uid, unpack_ip(value=ip)) for uid, ip in zip(self.users, self.ips)]
+
+
+class StatsRecord(StatRecord):
+    """ Message counters from station: [(sender type, msg type, count)] """
+
+    __slots__ = ('stats',)
+
+    def __init__(self, msg_time: float, stats: List[Dict]):
+        super().__init__(msg_time=msg_time)
+        self.stats: Tuple[Tuple, ...] = tuple(
+            (_intern_value(item.get('S')), _intern_value(item.get('T')), item.get('C')) for item in stats
+        )
+
+    def items(self) -> List[Dict]:
+        return [{'S': s, 'T': t, 'C': c} for s, t, c in self.stats]
+
+
+class SpeedsRecord(StatRecord):
+    """ Station speeds tested by client """
+
+    __slots__ = ('sender', 'provider', 'client', 'port', 'stations', 'sockets', 'response_times')
+
+    def __init__(self, msg_time: float, sender: Optional[str], provider: Optional[str],
+                 stations: List[Dict], client: Union[str, List, None]):
+        super().__init__(msg_time=msg_time)
+        self.sender = intern_str(sender)
+        self.provider = intern_str(provider)
+        self.client, self.port = pack_address(address=client)
+        names = []
+        sockets = []
+        times = array('d')
+        for srv in stations:
+            host = srv.get('host')
+            port = srv.get('port')
+            names.append(intern_str('%s:%d' % (host, port)))
+            # client address seen by this station
+            sockets.append(pack_address(address=srv.get('socket_address')))
+            response_time = srv.get('response_time')
+            times.append(-1.0 if response_time is None else response_time)
+        self.stations: Tuple[str, ...] = tuple(names)
+        self.sockets: Tuple[Tuple, ...] = tuple(sockets)
+        self.response_times = times
+
+    def items(self) -> List[Dict]:
+        client = unpack_address(ip=self.client, port=self.port)
+        items = []
+        for station, socket_address, response_time in zip(self.stations, self.sockets, self.response_times):
+            if socket_address[0] is not None:
+                address = unpack_address(ip=socket_address[0], port=socket_address[1])
+            else:
+                address = client
+            items.append({
+                'U': self.sender,
+                'provider': self.provider,
+                'station': station,
+                'client': address,
+                'response_time': None if response_time < 0 else response_time,
+            })
+        return items
+
+
+def create_record(mod: str, msg_time: float, info: Dict) -> Optional[StatRecord]:
+    """ convert log info to compact record """
+    if mod == 'users':
+        users = info.get('users')
+        return UsersRecord(msg_time=msg_time, users=[] if users is None else users)
+    elif mod == 'stats':
+        stats = info.get('stats')
+        return StatsRecord(msg_time=msg_time, stats=[] if stats is None else stats)
+    elif mod == 'speeds':
+        stations = info.get('stations')
+        return SpeedsRecord(msg_time=msg_time, sender=info.get('U'), provider=info.get('provider'),
+                            stations=[] if stations is None else stations,
+                            client=info.get('remote_address'))
+
+
+def parse_record(content: CustomizedContent) -> Optional[StatRecord]:
+    """ convert station log content to compact record """
+    msg_time = content.time
+    msg_time = 0 if msg_time is None else msg_time.timestamp
+    return create_record(mod=content.module, msg_time=msg_time, info=content)
+
+
+MAX_BATCH_SIZE = 1 << 24  # 16 MB (decompressed)
+
+
+def _unzip(data: bytes) -> bytes:
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)  # gzip
+    data = decompressor.decompress(data, MAX_BATCH_SIZE)
+    assert decompressor.unconsumed_tail == b'', 'batch data too big: > %d' % MAX_BATCH_SIZE
+    return data
+
+
+def parse_batch(content: CustomizedContent) -> List[StatRecord]:
+    """
+        Convert batch content to compact records
+
+            {
+                "app"    : "chat.dim.monitor",
+                "mod"    : "batch",
+                "records": [
+                    {
+                        "mod"  : "users",   // or 'stats', 'speeds'
+                        "time" : 1234567890,
+                        "users": [...]      // same fields as the single module content
+                    },
+                    ...
+                ],
+                // - OR -
+                "data"       : "{BASE64_ENCODE}",  // encoded 'records'
+                "compression": "gzip"              // optional
+            }
+    """
+    array_info = content.get('records')
+    if array_info is None:
+        data = content.get('data')
+        if not isinstance(data, str):
+            return []
+        data = base64_decode(string=data)
+        if content.get('compression') == 'gzip':
+            data = _unzip(data=data)
+        array_info = json_decode(string=utf8_decode(data=data))
+    if not isinstance(array_info, List):
+        return []
+    default_time = content.time
+    default_time = 0 if default_time is None else default_time.timestamp
+    records = []
+    for item in array_info:
+        if not isinstance(item, Dict):
+            continue
+        msg_time = item.get('time')
+        if not isinstance(msg_time, (int, float)):
+            msg_time = default_time
+        rec = create_record(mod=item.get('mod'), msg_time=msg_time, info=item)
+        if rec is not None:
+            records.append(rec)
+    return records
+
+
+#
+#   Query Results
+#
+
+
+class UserInfo:
+    """ User with client IPs """
+
+    __slots__ = ('sender', 'ips')
+
+    def __init__(self, sender: str):
+        super().__init__()
+        self.sender = intern_str(sender)
+        self.ips: Set[Union[int, str]] = set()
+
+    @property
+    def ip_list(self) -> List[str]:
+        return [unpack_ip(value=ip) for ip in self.ips]
+
+
+class SpeedInfo:
+    """ Response times from client to station """
+
+    __slots__ = ('station', 'client_ip', 'sender', 'provider', 'rt')
+
+    def __init__(self, station: str, client_ip: Union[int, str, None]):
+        super().__init__()
+        self.station = intern_str(station)
+        self.client_ip = client_ip
+        self.sender: Optional[str] = None
+        self.provider: Optional[str] = None
+        self.rt = array('d')
+
+    @property
+    def client(self) -> Optional[str]:
+        return unpack_ip(value=self.client_ip)
@@ -24,14 +24,19 @@
 # SOFTWARE.
 # ==============================================================================
 
+import asyncio
+import os
+import tempfile
 import time
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict
+from typing import Iterable, Callable, Awaitable
 
 from dimples import ID, Visa
 from dimples import ReliableMessage
 from dimples import Content
 from dimples import TextContent
 from dimples import BaseContentProcessor
+from dimples import Facebook, Messenger
 from dimples import CommonFacebook, CommonMessenger
 
 from libs.utils import template_replace
@@ -41,12 +46,21 @@ from libs.utils import get_locale
 from libs.utils import yesterday
 from libs.utils import Log, Logging
 from libs.utils import Config
+from libs.utils import IPLocator
+from libs.utils import LRUCacheManager
+from libs.utils import ReportBuilder
+from libs.utils import JobRunner
+from libs.utils import SingleFlight, RateLimiter
 
 from libs.client import RequestFilter
 from libs.client import Emitter
+from libs.client import UploadManager
 
 from bots.shared import GlobalVariable
 from bots.stat_recoder import g_recorder
+from bots.stat_records import UserInfo, SpeedInfo
+from bots.stat_export import EXPORT_COLUMNS, EXPORT_FORMATS
+from bots.stat_export import parse_range, export_file
 
 
 def math_stat(array: List[float]) -> Tuple[str, int]:
@@ -56,9 +70,7 @@ def math_stat(array: List[float]) -> Tuple[str, int]:
     elif count == 1:
         return '%.3f' % array[0], 1
     elif count == 2:
-        right = array.pop()
-        left = array.pop(0)
-        return '%.3f, %.3f' % (left, right), count
+        return '%.3f, %.3f' % (array[0], array[1]), count
     Log.info(msg='array (%d): %s' % (count, array))
     array = sorted(array)
     right = array.pop()
@@ -71,14 +83,61 @@ def parse_ip(ip):
     if ip is None:
         return None
     elif isinstance(ip, str):
-        return '[%s](https://ip138.com/iplookup.php?ip=%s "")' % (ip, ip)
+        return _md_ip(ip=ip)
     array = []
     for item in ip:
-        text = '[%s](https://ip138.com/iplookup.php?ip=%s "")' % (item, item)
-        array.append(text)
+        array.append(_md_ip(ip=item))
     return array
 
 
+def _md_ip(ip: str) -> str:
+    text = '[%s](https://ip138.com/iplookup.php?ip=%s "")' % (ip, ip)
+    location = IPLocator().lookup(ip=ip)
+    if location is None:
+        return text
+    return '%s %s' % (text, location)
+
+
+def ip_region(ip, key: str) -> str:
+    """ get country or ASN for IP (or IP list) """
+    location = IPLocator().lookup(ip=ip)
+    if location is None:
+        region = None
+    elif key == 'asn':
+        region = location.as_name
+    else:
+        region = location.country
+    return 'Unknown' if region is None else region
+
+
+def parse_args(args: List[str]) -> Tuple[str, Optional[str]]:
+    """ get day & group key from command arguments: '{yyyy-mm-dd} by country|asn' """
+    day = ''
+    group_by = None
+    pos = 0
+    while pos < len(args):
+        item = args[pos]
+        pos += 1
+        if len(item) == 0:
+            continue
+        elif item == 'by' and pos < len(args):
+            group_by = args[pos].lower()
+            pos += 1
+        elif len(day) == 0:
+            day = item
+    return day, group_by
+
+
+# worker pool for heavy reports
+g_jobs = JobRunner(workers=2, max_jobs=16)
+
+# identical queries share one loading
+g_flight = SingleFlight()
+
+# reports for each sender: burst 5, then 1 per 30 seconds
+g_limiter = RateLimiter(capacity=5, rate=1/30.0)
+
+
 #
 #   CPU - Content Processing Unit
 #
@@ -87,6 +146,10 @@ def parse_ip(ip):
 class TextContentProcessor(BaseContentProcessor, Logging):
     """ Process text message content """
 
+    def __init__(self, facebook: Facebook, messenger: Messenger):
+        super().__init__(facebook=facebook, messenger=messenger)
+        self.__filter: Optional[RequestFilter] = None
+
     @property
     def config(self) -> Config:
         shared = GlobalVariable()
@@ -106,99 +169,328 @@ class TextContentProcessor(BaseContentProcessor, Logging):
 
     @property
     def request_filter(self) -> RequestFilter:
-        return RequestFilter(facebook=self.facebook)
+        request_filter = self.__filter
+        if request_filter is None or request_filter.facebook is not self.facebook:
+            request_filter = RequestFilter(facebook=self.facebook)
+            self.__filter = request_filter
+        return request_filter
 
     async def __get_visa(self, sender: str) -> Optional[Visa]:
         identifier = ID.parse(identifier=sender)
         if identifier is not None:
-            return await self.facebook.get_visa(user=identifier)
+            return await self.request_filter.get_visa(identifier=identifier)
+
+    VISA_CONCURRENCY = 16  # max concurrent visa queries for one report
+    VISA_TIMEOUT = 8.0     # seconds for each visa query
+
+    async def __get_visas(self, senders: Iterable[Optional[str]]) -> Dict[str, Optional[Visa]]:
+        """ resolve visas concurrently, unresolved ones will be None """
+        semaphore = asyncio.Semaphore(self.VISA_CONCURRENCY)
 
-    async def __get_users(self, day: str) -> str:
+        async def resolve(uid: str) -> Optional[Visa]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.__get_visa(sender=uid), timeout=self.VISA_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.warning(msg='get visa timeout: %s' % uid)
+                except Exception as error:
+                    self.error(msg='failed to get visa: %s, %s' % (uid, error))
+
+        # unique senders, keep the order
+        array = [uid for uid in dict.fromkeys(senders) if uid is not None]
+        # warm up the caches with one round trip to redis
+        database = GlobalVariable().database
+        if database is not None:
+            identifiers = [ID.parse(identifier=uid) for uid in array]
+            await database.prefetch(identifiers=[did for did in identifiers if did is not None])
+        results = await asyncio.gather(*[resolve(uid=uid) for uid in array])
+        return dict(zip(array, results))
+
+    def __parse_day(self, day: str) -> Tuple[Optional[float], str]:
         day = day.strip()
         if len(day) == 0:
             now = time.time()
             day = time.strftime('%Y-%m-%d', time.localtime(now))
-        else:
-            try:
-                now = time.mktime(time.strptime(day, '%Y-%m-%d'))
-            except ValueError as e:
-                text = 'error date: %s, %s' % (day, e)
-                self.error(msg=text)
-                return text
-        text = '| User | IP |\n'
-        text += '|------|----|\n'
-        users = await g_recorder.get_users(now=now)
-        self.info(msg='users: %s' % str(users))
+            return now, day
+        try:
+            return time.mktime(time.strptime(day, '%Y-%m-%d')), day
+        except ValueError as e:
+            text = 'error date: %s, %s' % (day, e)
+            self.error(msg=text)
+            return None, text
+
+    REPORT_BATCH = 256  # rows for each batch of visa queries
+
+    async def __get_users(self, day: str, builder: ReportBuilder, group_by: Optional[str] = None):
+        now, day = self.__parse_day(day=day)
+        if now is None:
+            await builder.finish(footer=day)
+            return
+        users = await g_flight.run(key=('users', day), factory=lambda: g_recorder.get_users(now=now))
+        self.info(msg='users: %d' % len(users))
+        if group_by is not None:
+            await self.__get_users_regions(users=users, day=day, group_by=group_by, builder=builder)
+            return
+        builder.header = '| User | IP |\n' \
+                         '|------|----|\n'
+        batch = self.REPORT_BATCH
+        for start in range(0, len(users), batch):
+            array = users[start:start+batch]
+            visas = await self.__get_visas(senders=[item.sender for item in array])
+            for item in array:
+                # get user info
+                sender = item.sender
+                visa = visas.get(sender)
+                if visa is None:
+                    title = '**%s**' % sender
+                else:
+                    title = md_user_url(visa=visa)
+                    # get language
+                    locale = get_locale(visa=visa)
+                    if locale is not None:
+                        title = '%s - %s' % (title, locale)
+                # get IP info
+                ip = item.ip_list
+                ip = parse_ip(ip=ip)
+                await builder.add_row(row='| %s | %s |\n' % (title, ip))
+        await builder.finish(footer='Total: %d, Date: %s' % (len(users), day))
+
+    # noinspection PyMethodMayBeStatic
+    async def __get_users_regions(self, users: List[UserInfo], day: str, group_by: str, builder: ReportBuilder):
+        regions: Dict[str, int] = {}
         for item in users:
-            # get user info
-            sender = item.get('U')
-            visa = await self.__get_visa(sender=sender)
-            if visa is None:
-                title = '**%s**' % sender
-            else:
-                title = md_user_url(visa=visa)
-                # get language
-                locale = get_locale(visa=visa)
-                if locale is not None:
-                    title = '%s - %s' % (title, locale)
-            # get IP info
-            ip = item.get('IP')
-            ip = parse_ip(ip=ip)
-            text += '| %s | %s |\n' % (title, ip)
-        text += '\n'
-        text += 'Total: %d, Date: %s' % (len(users), day)
-        return text
+            region = ip_region(ip=item.ip_list, key=group_by)
+            regions[region] = regions.get(region, 0) + 1
+        title = 'ASN' if group_by == 'asn' else 'Country'
+        builder.header = '| %s | Users |\n' \
+                         '|------|-------|\n' % title
+        for region in sorted(regions, key=lambda key: regions[key], reverse=True):
+            await builder.add_row(row='| %s | %d |\n' % (region, regions[region]))
+        await builder.finish(footer='Total: %d, Regions: %d, Date: %s' % (len(users), len(regions), day))
 
-    async def __get_speeds(self, day: str) -> str:
-        day = day.strip()
-        if len(day) == 0:
-            now = time.time()
-            day = time.strftime('%Y-%m-%d', time.localtime(now))
-        else:
-            try:
-                now = time.mktime(time.strptime(day, '%Y-%m-%d'))
-            except ValueError as e:
-                text = 'error date: %s, %s' % (day, e)
-                self.error(msg=text)
-                return text
-        text = '| User | IP | Station | Times |\n'
-        text += '|-----|----|---------|-------|\n'
-        speeds = await g_recorder.get_speeds(now=now)
-        self.info(msg='speeds: %s' % str(speeds))
+    async def __get_speeds(self, day: str, builder: ReportBuilder, group_by: Optional[str] = None):
+        now, day = self.__parse_day(day=day)
+        if now is None:
+            await builder.finish(footer=day)
+            return
+        speeds, summary = await g_flight.run(key=('speeds', day), factory=lambda: g_recorder.get_speeds(now=now))
+        self.info(msg='speeds: %d' % len(speeds))
+        if group_by is not None:
+            await self.__get_speeds_regions(speeds=speeds, day=day, group_by=group_by, builder=builder)
+            return
+        builder.header = '| User | IP | Station | Times |\n' \
+                         '|-----|----|---------|-------|\n'
+        batch = self.REPORT_BATCH
+        for start in range(0, len(speeds), batch):
+            array = speeds[start:start+batch]
+            visas = await self.__get_visas(senders=[item.sender for item in array])
+            for item in array:
+                sender = item.sender
+                ip = item.client
+                ip = parse_ip(ip=ip)
+                mta = item.station
+                if isinstance(mta, str):
+                    pos = mta.find(':')
+                    if pos > 0:
+                        mta = mta[:pos]
+                rt = item.rt
+                rt, c = math_stat(array=rt)
+                if c > 3:
+                    rt += ', count: %d' % c
+                # get user info
+                visa = visas.get(sender)
+                if visa is None:
+                    title = '**%s**' % sender
+                else:
+                    title = md_user_url(visa=visa)
+                await builder.add_row(row='| **%s** | %s | %s | %s |\n' % (title, ip, mta, rt))
+        footer = 'Total: %d, Date: %s' % (len(speeds), day)
+        if summary is not None:
+            kept = sum([len(item.rt) for item in speeds])
+            count = sum([info.get('count', 0) for info in summary.values()])
+            footer += '\nSampled: %d of %d measurements' % (kept, count)
+        await builder.finish(footer=footer)
+
+    # noinspection PyMethodMayBeStatic
+    async def __get_speeds_regions(self, speeds: List[SpeedInfo], day: str, group_by: str, builder: ReportBuilder):
+        # (region, station) => response times
+        regions: Dict[Tuple[str, str], List[float]] = {}
         for item in speeds:
-            sender = item.get('U')
-            ip = item.get('client_ip')
-            ip = parse_ip(ip=ip)
-            mta = item.get('station')
+            region = ip_region(ip=item.client, key=group_by)
+            mta = item.station
             if isinstance(mta, str):
                 pos = mta.find(':')
                 if pos > 0:
                     mta = mta[:pos]
-            rt = item.get('rt')
-            rt, c = math_stat(array=rt)
+            key = (region, mta)
+            array = regions.get(key)
+            if array is None:
+                array = []
+                regions[key] = array
+            array.extend(item.rt)
+        title = 'ASN' if group_by == 'asn' else 'Country'
+        builder.header = '| %s | Station | Times |\n' \
+                         '|------|---------|-------|\n' % title
+        for key in sorted(regions):
+            rt, c = math_stat(array=regions[key])
             if c > 3:
                 rt += ', count: %d' % c
-            # get user info
-            visa = await self.__get_visa(sender=sender)
-            if visa is None:
-                title = '**%s**' % sender
+            await builder.add_row(row='| %s | %s | %s |\n' % (key[0], key[1], rt))
+        await builder.finish(footer='Total: %d, Groups: %d, Date: %s' % (len(speeds), len(regions), day))
+
+    async def __export(self, kind: str, days: List[float], title: str, fmt: str, receiver: ID,
+                       builder: ReportBuilder):
+        fd, path = tempfile.mkstemp(suffix='.%s.gz' % fmt)
+        os.close(fd)
+        try:
+            count = await export_file(kind=kind, days=days, fmt=fmt, path=path)
+            size = os.path.getsize(path)
+            self.info(msg='exported %s: %d rows, %d bytes, range: %s' % (kind, count, size, title))
+            filename = '%s_%s.%s.gz' % (kind, title.replace('..', '_'), fmt)
+            await Emitter().send_file(path=path, filename=filename, receiver=receiver)
+        finally:
+            os.remove(path)
+        await builder.finish(footer='Exported: %s, Rows: %d, Size: %d bytes, Range: %s' % (filename, count, size, title))
+
+    def __parse_export(self, cmd: str) -> Tuple[Optional[Tuple[str, List[float], str, str]], str]:
+        """ 'export users|speeds|stats {range} csv|ndjson' => ((kind, days, title, format), error) """
+        array = [item for item in cmd.split(' ') if len(item) > 0]
+        kind = array[1] if len(array) > 1 else ''
+        if kind not in EXPORT_COLUMNS:
+            return None, 'Unknown export: "%s"' % kind
+        fmt = 'csv'
+        text = ''
+        for item in array[2:]:
+            if item.lower() in EXPORT_FORMATS:
+                fmt = item.lower()
             else:
-                title = md_user_url(visa=visa)
-            text += '| **%s** | %s | %s | %s |\n' % (title, ip, mta, rt)
+                text = item
+        days, title = parse_range(text=text)
+        if days is None:
+            self.error(msg=title)
+            return None, title
+        return (kind, days, title, fmt), ''
+
+    # noinspection PyMethodMayBeStatic
+    def __get_caches(self) -> str:
+        text = '| Cache | Size | Hits | Misses | Hit Rate |\n'
+        text += '|-------|------|------|--------|----------|\n'
+        info = LRUCacheManager().stats
+        for name in info:
+            item = info[name]
+            text += '| %s | %d/%d | %d | %d | %.1f%% |\n' % (name, item['size'], item['capacity'],
+                                                           item['hits'], item['misses'], item['hit_rate'] * 100)
+        emitter = Emitter()
         text += '\n'
-        text += 'Total: %d, Date: %s' % (len(speeds), day)
+        text += 'Outgoing tasks: %d, bytes: %d' % (emitter.pending_count, emitter.pending_bytes)
+        return text
+
+    # noinspection PyMethodMayBeStatic
+    def __get_top(self) -> str:
+        window = g_recorder.window
+        info = window.snapshot()
+        text = '## Live (last %d minutes)\n' % window.minutes
+        text += 'Online users: %d\n' % info['users']
+        text += '\n'
+        text += '| Minute | Users | Messages | Speeds |\n'
+        text += '|--------|-------|----------|--------|\n'
+        for item in reversed(info['minutes']):
+            minute = time.strftime('%H:%M', time.localtime(item['minute']))
+            text += '| %s | %d | %d | %d |\n' % (minute, item['users'], item['messages'], item['speeds'])
+        messages = info['messages']
+        if len(messages) > 0:
+            text += '\n'
+            text += '| Type | Messages |\n'
+            text += '|------|----------|\n'
+            for msg_type in sorted(messages, key=lambda t: messages[t], reverse=True):
+                text += '| %s | %d |\n' % (msg_type, messages[msg_type])
+        stations = info['stations']
+        if len(stations) > 0:
+            text += '\n'
+            text += '| Station | Latency | Samples |\n'
+            text += '|---------|---------|---------|\n'
+            for item in sorted(stations, key=lambda s: s['ewma'], reverse=True):
+                text += '| %s | %.3f | %d |\n' % (item['station'], item['ewma'], item['samples'])
+        return text
+
+    # noinspection PyMethodMayBeStatic
+    def __get_jobs(self) -> str:
+        jobs = g_jobs.all_jobs()
+        now = time.time()
+        text = '| Job | Command | Owner | Status | Time |\n'
+        text += '|-----|---------|-------|--------|------|\n'
+        for job in jobs:
+            start = job.created if job.started is None else job.started
+            text += '| %d | %s | %s | %s | %.1fs |\n' % (job.sn, job.title, job.owner, job.status, now - start)
+        text += '\n'
+        text += 'Total: %d, Workers: %d' % (len(jobs), g_jobs.workers)
+        return text
+
+    # noinspection PyMethodMayBeStatic
+    def __cancel_job(self, cmd: str) -> str:
+        array = cmd.split(' ')
+        sn = array[-1].strip().lstrip('#')
+        job = g_jobs.cancel(sn=int(sn)) if sn.isdigit() else None
+        if job is None:
+            return 'Job not found: "%s"' % sn
+        return 'Job #%d cancelled: "%s"' % (job.sn, job.title)
+
+    def _submit_report(self, cmd: str, sender: ID, builder: ReportBuilder, factory: Callable[[], Awaitable]) -> str:
+        """ run report in background, respond 'accepted' at once """
+        if g_jobs.is_full:
+            # check before taking a token, so 'Busy' costs nothing
+            return self.__busy()
+        if not g_limiter.allow(key=sender):
+            self.warning(msg='too many requests: "%s", sender: %s' % (cmd, sender))
+            text = 'Too Many Requests\n'
+            text += '\n----\n'
+            text += 'Please try again later.'
+            return text
+
+        async def run():
+            try:
+                await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.error(msg='failed to build report: "%s", %s' % (cmd, error))
+                await builder.finish(footer='Error\n\n----\nFailed to build report: "%s"' % cmd)
+
+        job = g_jobs.submit(title=cmd, owner=sender, factory=run)
+        if job is None:
+            return self.__busy()
+        text = 'Accepted\n'
+        text += '\n----\n'
+        text += 'Job #%d: "%s", the report will be sent when ready.' % (job.sn, cmd)
+        return text
+
+    @classmethod
+    def __busy(cls) -> str:
+        text = 'Busy\n'
+        text += '\n----\n'
+        text += 'Too many reports running, please try again later.'
         return text
 
     ADMIN_COMMANDS = [
         'users',
         'speeds',
+        'top',
+        'caches',
+        'jobs',
     ]
 
     HELP_PROMPT = '## Admin Commands\n' \
                   '* users\n' \
                   '* users {yyyy-mm-dd}\n' \
+                  '* users {yyyy-mm-dd} by country\n' \
                   '* speeds\n' \
-                  '* speeds {yyyy-mm-dd}\n'
+                  '* speeds {yyyy-mm-dd}\n' \
+                  '* speeds {yyyy-mm-dd} by asn\n' \
+                  '* export users|speeds|stats {yyyy-mm-dd}..{yyyy-mm-dd} csv|ndjson\n' \
+                  '* top\n' \
+                  '* caches\n' \
+                  '* jobs\n' \
+                  '* cancel {job}\n'
 
     async def _help_info(self) -> str:
         prompt = template_replace(template=self.HELP_PROMPT, key='yyyy-mm-dd', value=yesterday())
@@ -206,7 +498,24 @@ class TextContentProcessor(BaseContentProcessor, Logging):
         text = await md_supervisors(config=self.config, facebook=self.facebook, section='statistic')
         return '%s\n\n## Supervisors\n%s' % (prompt, text)
 
-    async def _process_admin_command(self, cmd: str, sender: ID) -> str:
+    def _create_builder(self, request: Content, receiver: ID) -> ReportBuilder:
+        """ report pages will be sent to the receiver (user or group) one by one """
+        emitter = Emitter()
+
+        async def send_page(text: str, page: int):
+            self.info(msg='sending report page %d (length: %d) to %s' % (page, len(text), receiver))
+            response = TextContent.create(text=text)
+            # respond in markdown format
+            response['format'] = 'markdown'
+            # calibrate the clock, keep pages in order
+            calibrate_time(content=response, request=request, period=1.0 + page * 0.001)
+            await emitter.send_content(content=response, receiver=receiver)
+
+        return ReportBuilder(send_page=send_page, page_size=self.REPORT_PAGE_SIZE)
+
+    REPORT_PAGE_SIZE = 64 * 1024  # max characters for one report message
+
+    async def _process_admin_command(self, cmd: str, sender: ID, request: Content, receiver: ID) -> str:
         # check permissions before executing command
         self.info(msg='process admin command: "%s"' % cmd)
         supervisors = await get_supervisors(config=self.config, facebook=self.facebook, section='statistic')
@@ -222,22 +531,57 @@ class TextContentProcessor(BaseContentProcessor, Logging):
         #
         if cmd.startswith('users'):
             array = cmd.split(' ')
-            if len(array) == 1:
-                day = ''
-            else:
-                day = array[1]
-            return await self.__get_users(day=day)
+            day, group_by = parse_args(args=array[1:])
+            builder = self._create_builder(request=request, receiver=receiver)
+            return self._submit_report(cmd=cmd, sender=sender, builder=builder,
+                                       factory=lambda: self.__get_users(day=day, group_by=group_by, builder=builder))
         #
         #  query speeds
         #
         if cmd.startswith('speeds'):
             # query speeds
             array = cmd.split(' ')
-            if len(array) == 1:
-                day = ''
-            else:
-                day = array[1]
-            return await self.__get_speeds(day=day)
+            day, group_by = parse_args(args=array[1:])
+            builder = self._create_builder(request=request, receiver=receiver)
+            return self._submit_report(cmd=cmd, sender=sender, builder=builder,
+                                       factory=lambda: self.__get_speeds(day=day, group_by=group_by, builder=builder))
+        #
+        #  export raw data
+        #
+        if cmd.startswith('export'):
+            args, error = self.__parse_export(cmd=cmd)
+            if args is None:
+                text = 'Error\n'
+                text += '\n----\n'
+                text += error
+                return text
+            if UploadManager().pool.uploader is None:
+                text = 'Error\n'
+                text += '\n----\n'
+                text += 'Uploader not configured, cannot send exported files.'
+                return text
+            kind, days, title, fmt = args
+            builder = self._create_builder(request=request, receiver=receiver)
+            return self._submit_report(cmd=cmd, sender=sender, builder=builder,
+                                       factory=lambda: self.__export(kind=kind, days=days, title=title, fmt=fmt,
+                                                                     receiver=receiver, builder=builder))
+        #
+        #  live counters
+        #
+        if cmd == 'top':
+            return self.__get_top()
+        #
+        #  cache stats
+        #
+        if cmd == 'caches':
+            return self.__get_caches()
+        #
+        #  background jobs
+        #
+        if cmd == 'jobs':
+            return self.__get_jobs()
+        if cmd.startswith('cancel'):
+            return self.__cancel_job(cmd=cmd)
         #
         #  error
         #
@@ -266,15 +610,18 @@ class TextContentProcessor(BaseContentProcessor, Logging):
             return []
         else:
             text = naked.strip()
+        receiver = sender if group is None else group
         #
         #   system commands
         #
         if text == 'help':
             res = await self._help_info()
         elif text in self.ADMIN_COMMANDS:
-            res = await self._process_admin_command(cmd=text, sender=sender)
-        elif text.startswith('users ') or text.startswith('speeds '):
-            res = await self._process_admin_command(cmd=text, sender=sender)
+            res = await self._process_admin_command(cmd=text, sender=sender, request=content, receiver=receiver)
+        elif text.startswith('users ') or text.startswith('speeds ') or text.startswith('cancel '):
+            res = await self._process_admin_command(cmd=text, sender=sender, request=content, receiver=receiver)
+        elif text.startswith('export '):
+            res = await self._process_admin_command(cmd=text, sender=sender, request=content, receiver=receiver)
         else:
             res = 'Unexpected command: "%s"' % text
             # TODO: parse text for your business
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Rolling Window
+    ~~~~~~~~~~~~~~
+
+    Live counters for the last N minutes, kept in a ring buffer of minute slots,
+    updated when records arrive, so 'top' needs no file I/O.
+"""
+
+import threading
+import time
+from typing import Optional, Set, List, Dict
+
+from bots.stat_records import StatRecord, UsersRecord, StatsRecord, SpeedsRecord
+
+
+class MinuteSlot:
+    """ Counters in one minute """
+
+    __slots__ = ('minute', 'users', 'messages', 'speeds')
+
+    def __init__(self, minute: int):
+        super().__init__()
+        self.minute = minute
+        self.users: Set[str] = set()
+        # msg_type => count
+        self.messages: Dict[str, int] = {}
+        self.speeds = 0
+
+
+class StationLatency:
+    """ EWMA of response times """
+
+    __slots__ = ('ewma', 'samples', 'last_time')
+
+    def __init__(self):
+        super().__init__()
+        self.ewma = 0.0
+        self.samples = 0
+        self.last_time = 0.0
+
+
+class RollingWindow:
+    """ Ring buffer of minute slots """
+
+    ALPHA = 0.2  # smoothing factor for EWMA
+
+    MAX_STATIONS = 4096  # station names come from client logs
+
+    def __init__(self, minutes: int = 15):
+        super().__init__()
+        assert minutes > 0, 'window size error: %d' % minutes
+        self.__lock = threading.Lock()
+        self.__slots: List[Optional[MinuteSlot]] = [None] * minutes
+        # station => latency
+        self.__stations: Dict[str, StationLatency] = {}
+
+    @property
+    def minutes(self) -> int:
+        return len(self.__slots)
+
+    def _slot(self, msg_time: float, now: float) -> Optional[MinuteSlot]:
+        minute = int(msg_time // 60)
+        current = int(now // 60)
+        if minute > current or minute <= current - len(self.__slots):
+            # out of window
+            return None
+        index = minute % len(self.__slots)
+        slot = self.__slots[index]
+        if slot is None or slot.minute != minute:
+            if slot is not None and slot.minute > minute:
+                # newer minute already here
+                return None
+            slot = MinuteSlot(minute=minute)
+            self.__slots[index] = slot
+        return slot
+
+    def add(self, record: StatRecord, now: float = None):
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            slot = self._slot(msg_time=record.time, now=now)
+            if slot is None:
+                return
+            if isinstance(record, UsersRecord):
+                slot.users.update(record.users)
+            elif isinstance(record, StatsRecord):
+                messages = slot.messages
+                for _, msg_type, count in record.stats:
+                    if isinstance(count, int):
+                        messages[msg_type] = messages.get(msg_type, 0) + count
+            elif isinstance(record, SpeedsRecord):
+                slot.speeds += 1
+                self._update_latency(record=record, msg_time=record.time, now=now)
+
+    def _update_latency(self, record: SpeedsRecord, msg_time: float, now: float):
+        stations = self.__stations
+        alpha = self.ALPHA
+        for station, response_time in zip(record.stations, record.response_times):
+            if response_time <= 0:
+                continue
+            latency = stations.get(station)
+            if latency is None:
+                if len(stations) >= self.MAX_STATIONS:
+                    self._evict_stations(now=now)
+                latency = StationLatency()
+                latency.ewma = response_time
+                stations[station] = latency
+            else:
+                latency.ewma += alpha * (response_time - latency.ewma)
+            latency.samples += 1
+            if msg_time > latency.last_time:
+                latency.last_time = msg_time
+
+    def _evict_stations(self, now: float):
+        """ remove stations out of window, then the least recently updated ones """
+        stations = self.__stations
+        start = (int(now // 60) - len(self.__slots) + 1) * 60
+        for name in [name for name, latency in stations.items() if latency.last_time < start]:
+            stations.pop(name, None)
+        if len(stations) >= self.MAX_STATIONS:
+            array = sorted(stations.items(), key=lambda item: item[1].last_time)
+            for name, _ in array[:len(stations) - self.MAX_STATIONS + 1]:
+                stations.pop(name, None)
+
+    def snapshot(self, now: float = None) -> Dict:
+        """ live values in window """
+        if now is None:
+            now = time.time()
+        current = int(now // 60)
+        start = current - len(self.__slots) + 1
+        with self.__lock:
+            slots = [slot for slot in self.__slots if slot is not None and slot.minute >= start]
+            slots.sort(key=lambda s: s.minute)
+            users = set()
+            messages: Dict[str, int] = {}
+            minutes = []
+            for slot in slots:
+                users.update(slot.users)
+                total = 0
+                for msg_type, count in slot.messages.items():
+                    messages[msg_type] = messages.get(msg_type, 0) + count
+                    total += count
+                minutes.append({
+                    'minute': slot.minute * 60,
+                    'users': len(slot.users),
+                    'messages': total,
+                    'speeds': slot.speeds,
+                })
+            stations = []
+            expired = []
+            for name, latency in self.__stations.items():
+                if latency.last_time < start * 60:
+                    expired.append(name)
+                    continue
+                stations.append({
+                    'station': name,
+                    'ewma': latency.ewma,
+                    'samples': latency.samples,
+                    'last_time': latency.last_time,
+                })
+            for name in expired:
+                self.__stations.pop(name, None)
+        return {
+            'users': len(users),
+            'messages': messages,
+            'minutes': minutes,
+            'stations': stations,
+        }
@@ -36,6 +36,9 @@ from dimples.client import ClientMessageProcessor as ClientProcessor
 
 from .packer import ClientPacker
 from .emitter import Emitter
+from .upload import FileCache, Uploader, HttpUploader, LocalUploader, LocalUploadServer
+from .upload import UploadPool, UploadManager
+from .offload import CryptoPool, CryptoManager
 
 from .request import RequestFilter
 
@@ -51,6 +54,9 @@ __all__ = [
     'ClientProcessor',
     'ClientPacker',
     'Emitter',
+    'FileCache', 'Uploader', 'HttpUploader', 'LocalUploader', 'LocalUploadServer',
+    'UploadPool', 'UploadManager',
+    'CryptoPool', 'CryptoManager',
 
     'RequestFilter',
 
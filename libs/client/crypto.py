@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    Chunked Encryption
+    ~~~~~~~~~~~~~~~~~~
+
+    AES/CBC/PKCS7 over memoryview chunks, the output is byte-identical to
+    'AESKey.encrypt()' with the same IV (CBC chaining doesn't care about
+    how the plaintext is split by blocks), but no padded copy of the whole
+    plaintext is made, and files can be streamed from disk to disk.
+"""
+
+import hashlib
+import os
+from typing import Optional, Union, Tuple, Dict
+
+from Crypto.Cipher import AES
+
+from dimples import EncryptKey
+from dimples import SymmetricAlgorithms
+from dimplugins.crypto.aes import AESKey
+
+
+CHUNK_SIZE = 1 << 16  # 64 KB, multiple of AES block size
+
+
+class ChunkedEncryptor:
+    """ Encrypt data piece by piece, pad at the end """
+
+    def __init__(self, password: AESKey, extra: Dict):
+        super().__init__()
+        # same IV rules as 'AESKey.encrypt()'
+        iv = password._get_init_vector(params=extra)
+        if iv is None:
+            iv = password._new_init_vector(extra=extra)
+        self.__cipher = AES.new(password.data.to_bytes(), AES.MODE_CBC, iv)
+        # bytes not enough for a block
+        self.__tail = b''
+
+    def update(self, chunk: Union[bytes, memoryview]) -> bytes:
+        block = AES.block_size
+        tail = self.__tail
+        if len(tail) > 0:
+            head = block - len(tail)
+            if len(chunk) < head:
+                self.__tail = tail + bytes(chunk)
+                return b''
+            first = self.__cipher.encrypt(tail + bytes(chunk[:head]))
+            chunk = chunk[head:]
+        else:
+            first = b''
+        size = len(chunk) - len(chunk) % block
+        self.__tail = bytes(chunk[size:])
+        if size == 0:
+            return first
+        body = self.__cipher.encrypt(chunk[:size])
+        return first + body if len(first) > 0 else body
+
+    def update_into(self, chunk: memoryview, output: memoryview):
+        """ encrypt whole blocks into output buffer """
+        assert len(self.__tail) == 0 and len(chunk) % AES.block_size == 0, 'chunk not aligned: %d' % len(chunk)
+        self.__cipher.encrypt(chunk, output=output)
+
+    def finish(self) -> bytes:
+        """ PKCS7 padding """
+        block = AES.block_size
+        tail = self.__tail
+        amount = block - len(tail) % block
+        self.__tail = b''
+        return self.__cipher.encrypt(tail + bytes([amount]) * amount)
+
+
+def is_chunkable(password: EncryptKey) -> bool:
+    return isinstance(password, AESKey) and password.algorithm == SymmetricAlgorithms.AES
+
+
+def encrypt_data(password: EncryptKey, data: Union[bytes, memoryview], extra: Dict) -> bytes:
+    """ encrypt into one output buffer, without padded copy of plaintext """
+    if not is_chunkable(password=password):
+        return password.encrypt(plaintext=bytes(data), extra=extra)
+    view = memoryview(data)
+    body = len(view) - len(view) % AES.block_size
+    output = bytearray(body + AES.block_size)
+    out = memoryview(output)
+    encryptor = ChunkedEncryptor(password=password, extra=extra)
+    if body > 0:
+        encryptor.update_into(chunk=view[:body], output=out[:body])
+    encryptor.update(chunk=view[body:])
+    out[body:] = encryptor.finish()
+    return bytes(output)
+
+
+def encrypt_file(password: EncryptKey, src: str, dst: str, extra: Dict,
+                 chunk_size: int = CHUNK_SIZE) -> Tuple[int, bytes]:
+    """ stream file through encryption, return (size, MD5 digest) of encrypted file """
+    md5 = hashlib.md5()
+    size = 0
+    temp = '%s.%d.tmp' % (dst, os.getpid())
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if is_chunkable(password=password):
+        encryptor = ChunkedEncryptor(password=password, extra=extra)
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(src, 'rb') as reader, open(temp, 'wb') as writer:
+            while True:
+                count = reader.readinto(buffer)
+                if count == 0:
+                    break
+                piece = encryptor.update(chunk=view[:count])
+                md5.update(piece)
+                size += writer.write(piece)
+            piece = encryptor.finish()
+            md5.update(piece)
+            size += writer.write(piece)
+    else:
+        with open(src, 'rb') as reader:
+            data = password.encrypt(plaintext=reader.read(), extra=extra)
+        with open(temp, 'wb') as writer:
+            size = writer.write(data)
+        md5.update(data)
+    os.replace(temp, dst)
+    return size, md5.digest()
+
+
+def file_digest(path: str, chunk_size: int = CHUNK_SIZE) -> Tuple[int, bytes]:
+    """ (size, MD5 digest) of file """
+    md5 = hashlib.md5()
+    size = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb') as reader:
+        while True:
+            count = reader.readinto(buffer)
+            if count == 0:
+                break
+            md5.update(view[:count])
+            size += count
+    return size, md5.digest()
@@ -23,7 +23,11 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional, Tuple, Dict
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, List, Dict
 
 from dimples import EmbedData
 from dimples import EncryptKey, ID
@@ -34,18 +38,94 @@ from dimples.group import SharedGroupManager
 from dimples.client import ClientMessenger
 
 from ..utils import md5, hex_encode
-from ..utils import filename_from_data
+from ..utils import filename_from_data, get_extension
 from ..utils import Singleton, Log, Logging
 
+from .upload import UploadManager
+from .crypto import encrypt_data, encrypt_file, file_digest
+
+
+class OutgoingTask:
+    """ Message waiting for file uploading """
+
+    __slots__ = ('filename', 'msg', 'size', 'deadline', 'record')
+
+    def __init__(self, filename: str, msg: InstantMessage, size: int, deadline: float):
+        super().__init__()
+        self.filename = filename
+        self.msg = msg
+        self.size = size
+        self.deadline = deadline
+        # (key, params) for uploaded info
+        self.record: Optional[Tuple[str, Dict]] = None
+
+
+class OutgoingTasks:
+    """ Bounded task table, the oldest tasks will be evicted first (FIFO),
+        a task is only read when popped, so there is no access order to keep
+    """
+
+    def __init__(self, capacity: int = 1024, max_bytes: int = 1 << 28, expires: float = 3600):
+        super().__init__()
+        self.__capacity = capacity
+        self.__max_bytes = max_bytes
+        self.__expires = expires
+        # filename => task
+        self.__tasks: Dict[str, OutgoingTask] = OrderedDict()
+        self.__bytes = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.__tasks)
+
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    def put(self, filename: str, msg: InstantMessage, size: int, record: Tuple[str, Dict] = None,
+            now: float = None) -> List[OutgoingTask]:
+        """ add task, return evicted tasks """
+        if now is None:
+            now = time.time()
+        self.pop(filename=filename)
+        task = OutgoingTask(filename=filename, msg=msg, size=size, deadline=now + self.__expires)
+        task.record = record
+        self.__tasks[filename] = task
+        self.__bytes += size
+        evicted = []
+        while len(self.__tasks) > 1 and (len(self.__tasks) > self.__capacity or self.__bytes > self.__max_bytes):
+            _, old = self.__tasks.popitem(last=False)
+            self.__bytes -= old.size
+            evicted.append(old)
+        return evicted
+
+    def pop(self, filename: str) -> Optional[OutgoingTask]:
+        task = self.__tasks.pop(filename, None)
+        if task is not None:
+            self.__bytes -= task.size
+        return task
+
+    def purge(self, now: float = None) -> List[OutgoingTask]:
+        """ remove expired tasks """
+        if now is None:
+            now = time.time()
+        expired = [task for task in self.__tasks.values() if task.deadline < now]
+        for task in expired:
+            self.pop(filename=task.filename)
+        return expired
+
 
 @Singleton
 class Emitter(Logging):
 
+    SWEEP_INTERVAL = 60  # seconds
+
     def __init__(self):
         super().__init__()
         self.__messenger: Optional[ClientMessenger] = None
         # filename => task
-        self.__outgoing: Dict[str, InstantMessage] = {}
+        self.__outgoing = OutgoingTasks()
+        self.__sweeper: Optional[asyncio.Task] = None
 
     @property
     def messenger(self) -> ClientMessenger:
@@ -55,23 +135,56 @@ class Emitter(Logging):
     def messenger(self, transceiver: ClientMessenger):
         self.__messenger = transceiver
 
-    def _add_task(self, filename: str, msg: InstantMessage):
-        self.__outgoing[filename] = msg
+    @property
+    def pending_count(self) -> int:
+        """ number of messages waiting for uploading """
+        return self.__outgoing.count
 
-    def _pop_task(self, filename: str) -> Optional[InstantMessage]:
-        return self.__outgoing.pop(filename, None)
+    @property
+    def pending_bytes(self) -> int:
+        """ size of file data waiting for uploading """
+        return self.__outgoing.bytes
 
-    def purge(self):
-        # TODO: remove expired messages in the map
-        pass
+    async def _add_task(self, filename: str, msg: InstantMessage, size: int, record: Tuple[str, Dict] = None):
+        evicted = self.__outgoing.put(filename=filename, msg=msg, size=size, record=record)
+        for task in evicted:
+            self.warning(msg='too many tasks, evict: %s, size: %d' % (task.filename, task.size))
+            await self._task_failed(filename=task.filename, msg=task.msg)
+        if self.__sweeper is None:
+            self.__sweeper = asyncio.ensure_future(self._sweep())
+
+    def _pop_task(self, filename: str) -> Optional[OutgoingTask]:
+        return self.__outgoing.pop(filename=filename)
+
+    async def purge(self) -> int:
+        """ remove expired messages in the map """
+        expired = self.__outgoing.purge()
+        for task in expired:
+            self.warning(msg='task expired: %s, size: %d' % (task.filename, task.size))
+            await self._task_failed(filename=task.filename, msg=task.msg)
+        return len(expired)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.SWEEP_INTERVAL)
+            try:
+                await self.purge()
+            except Exception as error:
+                self.error(msg='failed to purge tasks: %s' % error)
 
     async def upload_success(self, filename: str, url: str):
         """ callback when file data uploaded to CDN and download URL responded """
-        msg = self._pop_task(filename=filename)
-        if msg is None:
+        task = self._pop_task(filename=filename)
+        if task is None:
             self.error(msg='failed to get task: %s, url: %s' % (filename, url))
             return
         self.info(msg='get task for file: %s, url: %s' % (filename, url))
+        msg = task.msg
+        # remember the URL, so the same file with same key needs not upload again
+        cache = UploadManager().cache
+        if cache is not None and task.record is not None:
+            key, params = task.record
+            cache.set_record(key=key, info={'url': url, 'params': params})
         # file data uploaded to FTP server, replace it with download URL
         # and send the content to station
         content = msg.content
@@ -82,11 +195,15 @@ class Emitter(Logging):
 
     async def upload_failed(self, filename: str):
         """ callback when failed to upload file data """
-        msg = self._pop_task(filename=filename)
-        if msg is None:
+        task = self._pop_task(filename=filename)
+        if task is None:
             self.error(msg='failed to get task: %s' % filename)
             return
         self.info(msg='get task for file: %s' % filename)
+        await self._task_failed(filename=filename, msg=task.msg)
+
+    async def _task_failed(self, filename: str, msg: InstantMessage):
+        self.info(msg='upload failed: %s' % filename)
         # file data failed to upload, mark it error
         msg['error'] = {
             'message': 'failed to upload file'
@@ -112,7 +229,7 @@ class Emitter(Logging):
         await self._save_instant_message(msg=msg)
         return r_msg
 
-    async def send_content(self, content: Content, receiver: ID) -> Tuple[InstantMessage, Optional[ReliableMessage]]:
+    async def _pack_message(self, content: Content, receiver: ID) -> InstantMessage:
         if receiver.is_group:
             assert 'group' not in content or content.group == receiver, 'group ID error: %s, %s' % (receiver, content)
             content.group = receiver
@@ -121,12 +238,17 @@ class Emitter(Logging):
         current = await facebook.current_user
         assert current is not None, 'current user not set'
         sender = current.identifier
-        # 1. pack instant message
         env = Envelope.create(sender=sender, receiver=receiver)
         i_msg = InstantMessage.create(head=env, body=content)
         muted = content.get('muted', None)
         if muted is not None:
             i_msg['muted'] = muted
+        return i_msg
+
+    async def send_content(self, content: Content, receiver: ID) -> Tuple[InstantMessage, Optional[ReliableMessage]]:
+        messenger = self.messenger
+        # 1. pack instant message
+        i_msg = await self._pack_message(content=content, receiver=receiver)
         # 2. check file content
         if isinstance(content, FileContent):
             # encrypt & upload file data before send out
@@ -158,28 +280,113 @@ class Emitter(Logging):
         data = content.data
         filename = content.filename
         assert data is not None and filename is not None, 'file content error: %s' % content
-        size = await cache_file_data(data=data.to_bytes(), filename=filename)
-        if size != len(data):
-            self.error(msg='failed to save file data (len=%d): %s' % (len(data), filename))
+        plaintext = data.to_bytes()
+        size = await cache_file_data(data=plaintext, filename=filename)
+        if size != len(plaintext):
+            self.error(msg='failed to save file data (len=%d): %s' % (len(plaintext), filename))
             return
         # 2. save instant message without file data
         content.data = None
         await self._save_instant_message(msg=msg)
-        # 3. add upload task with encrypted data
-        encrypted = password.encrypt(plaintext=data.to_bytes(), extra=msg.to_dict())
+        # 3. check uploaded before with same key
+        record_key = None
+        cache = UploadManager().cache
+        if cache is not None:
+            record_key = UploadManager.record_key(digest=md5(data=plaintext), password=password.to_dict())
+            info = cache.get_record(key=record_key)
+            if info is not None and info.get('url') is not None:
+                self.info(msg='file uploaded before: %s => %s' % (filename, info.get('url')))
+                # restore encryption params (e.g.: 'IV') for decrypting
+                params = info.get('params')
+                if isinstance(params, Dict):
+                    for key in params:
+                        msg[key] = params[key]
+                content.url = info.get('url')
+                return await self._send_instant_message(msg=msg)
+        # 4. add upload task with encrypted data
+        extra = msg.to_dict()
+        keys = set(extra.keys())
+        encrypted = encrypt_data(password=password, data=plaintext, extra=extra)
+        params = {key: extra[key] for key in extra if key not in keys}
         filename = filename_from_data(data=encrypted, filename=filename)
         sender = msg.sender
         url = await upload_encrypted_data(data=encrypted, filename=filename, sender=sender)
         if url is None:
-            # uploading in background thread
+            # uploading in background
             self.info(msg='wait for uploading: %s -> %s' % (content.filename, filename))
-            self._add_task(filename=filename, msg=msg)
+            record = None if record_key is None else (record_key, params)
+            await self._add_task(filename=filename, msg=msg, size=len(encrypted), record=record)
         else:
             # uploaded before
             self.info(msg='uploaded filename: %s -> %s => %s' % (content.filename, filename, url))
             content.url = url
             return await self._send_instant_message(msg=msg)
 
+    async def send_file(self, path: str, filename: str, receiver: ID) -> Optional[ReliableMessage]:
+        """
+        Send large file from disk, the data will be streamed through
+        local cache, encryption & uploading by chunks
+
+        :param path:     file path
+        :param filename: file name with extension
+        :param receiver: destination
+        """
+        loop = asyncio.get_event_loop()
+        size, digest = await loop.run_in_executor(None, file_digest, path)
+        ext = get_extension(filename=filename)
+        name = hex_encode(data=digest) if ext is None else '%s.%s' % (hex_encode(data=digest), ext)
+        man = UploadManager()
+        cache = man.cache
+        if cache is None:
+            self.error(msg='uploader not configured, cannot send file: %s (%d bytes)' % (path, size))
+            return None
+        # 1. save origin file data
+        await cache.save_file(src=path, filename=name)
+        content = FileContent.file(filename=name)
+        content['length'] = size
+        msg = await self._pack_message(content=content, receiver=receiver)
+        password = await self.messenger.get_encrypt_key(msg=msg)
+        assert password is not None, 'failed to get msg key for: %s -> %s' % (msg.sender, msg.receiver)
+        await self._save_instant_message(msg=msg)
+        # 2. check uploaded before with same key
+        record_key = UploadManager.record_key(digest=digest, password=password.to_dict())
+        info = cache.get_record(key=record_key)
+        if info is not None and info.get('url') is not None:
+            self.info(msg='file uploaded before: %s => %s' % (name, info.get('url')))
+            params = info.get('params')
+            if isinstance(params, Dict):
+                for key in params:
+                    msg[key] = params[key]
+            content.url = info.get('url')
+            return await self._send_instant_message(msg=msg)
+        # 3. encrypt from cache file to temporary file,
+        #    same file may be sent with different keys at the same time
+        extra = msg.to_dict()
+        keys = set(extra.keys())
+        temp = cache.temp_path(filename=record_key if ext is None else '%s.%s' % (record_key, ext))
+        length, enc_digest = await loop.run_in_executor(None, encrypt_file, password, cache.path(filename=name),
+                                                        temp, extra)
+        params = {key: extra[key] for key in extra if key not in keys}
+        # 4. add upload task, named by the encrypted data
+        upload_name = hex_encode(data=enc_digest)
+        if ext is not None:
+            upload_name = '%s.%s' % (upload_name, ext)
+        await self._add_task(filename=upload_name, msg=msg, size=length, record=(record_key, params))
+
+        async def callback(url: Optional[str]):
+            if os.path.exists(temp):
+                os.remove(temp)
+            if url is None:
+                await self.upload_failed(filename=upload_name)
+            else:
+                await self.upload_success(filename=upload_name, url=url)
+
+        self.info(msg='wait for uploading: %s -> %s (%d bytes)' % (filename, upload_name, length))
+        if not man.pool.submit_file(path=temp, digest=enc_digest, filename=upload_name, sender=msg.sender,
+                                    callback=callback):
+            # the callback will be called with None, removing the temporary file & failing the task
+            self.warning(msg='upload refused: %s' % upload_name)
+
     async def send_image_message(self, image: bytes, thumbnail: bytes, receiver: ID):
         """
         Send image message to receiver
@@ -212,14 +419,27 @@ class Emitter(Logging):
 
 
 async def cache_file_data(data: bytes, filename: str) -> int:
-    # TODO: save file data
+    """ save file data into local cache """
     size = len(data)
     Log.info(msg='save file: %s, length: %d' % (filename, size))
-    return size
+    cache = UploadManager().cache
+    if cache is None:
+        return size
+    return await cache.save(data=data, filename=filename)
 
 
 async def upload_encrypted_data(data: bytes, filename: str, sender: ID) -> Optional[str]:
-    # TODO: save file data
+    """ upload in background, return None to wait for callback """
     size = len(data)
     Log.info(msg='upload file: %s, length: %d, sender: %s' % (filename, size, sender))
+
+    async def callback(url: Optional[str]):
+        emitter = Emitter()
+        if url is None:
+            await emitter.upload_failed(filename=filename)
+        else:
+            await emitter.upload_success(filename=filename, url=url)
+
+    pool = UploadManager().pool
+    pool.submit(data=data, filename=filename, sender=sender, callback=callback)
     return None
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Crypto Offloading
+    ~~~~~~~~~~~~~~~~~
+
+    Process pool for the asymmetric crypto of incoming messages:
+    verifying 'msg.signature' with the sender's public keys,
+    and decrypting 'msg.key' with the receiver's private keys.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Any, List, Dict, Tuple
+
+from dimples import PublicKey, PrivateKey
+from dimples.common.compat import LibraryLoader
+
+from ..utils import Config
+from ..utils import Singleton, Logging
+
+
+#
+#   Worker process
+#
+
+# key data => key object, parsed in each worker process
+_worker_keys: Dict[str, Any] = {}
+
+
+def _init_worker():
+    LibraryLoader().run()
+
+
+def _get_key(info: Dict, private: bool):
+    tag = '%s:%s' % (info.get('algorithm'), info.get('data'))
+    key = _worker_keys.get(tag)
+    if key is None:
+        key = PrivateKey.parse(key=info) if private else PublicKey.parse(key=info)
+        if len(_worker_keys) >= 1024:
+            _worker_keys.clear()
+        _worker_keys[tag] = key
+    return key
+
+
+def _verify(keys: List[Dict], data: bytes, signature: bytes) -> bool:
+    for info in keys:
+        key = _get_key(info=info, private=False)
+        if key is not None and key.verify(data=data, signature=signature):
+            return True
+    return False
+
+
+def _decrypt(keys: List[Dict], ciphertexts: List[bytes]) -> Optional[bytes]:
+    for ciphertext in ciphertexts:
+        for info in keys:
+            key = _get_key(info=info, private=True)
+            if key is None:
+                continue
+            plaintext = key.decrypt(ciphertext=ciphertext)
+            if plaintext is not None and len(plaintext) > 0:
+                return plaintext
+
+
+def _run_batch(tasks: List[Tuple[str, tuple]]) -> List[Any]:
+    results = []
+    for name, args in tasks:
+        if name == 'verify':
+            results.append(_verify(*args))
+        else:
+            results.append(_decrypt(*args))
+    return results
+
+
+#
+#   Event loop side
+#
+
+class CryptoPool(Logging):
+    """ Batch crypto tasks to worker processes, results for each sender are released in order """
+
+    def __init__(self, workers: int = 2, batch: int = 16):
+        super().__init__()
+        assert workers > 0, 'workers count error: %d' % workers
+        self.__workers = workers
+        self.__batch = batch
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        # waiting tasks: (name, args, future)
+        self.__pending: List[Tuple[str, tuple, asyncio.Future]] = []
+        # sender => future of the last task
+        self.__tails: Dict[str, asyncio.Future] = {}
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    async def verify(self, sender: str, keys: List[Dict], data: bytes, signature: bytes) -> bool:
+        """ verify data & signature with any of the public keys """
+        return await self._call(sender=sender, name='verify', args=(keys, data, signature))
+
+    async def decrypt(self, sender: str, keys: List[Dict], ciphertexts: List[bytes]) -> Optional[bytes]:
+        """ decrypt any of the ciphertexts with any of the private keys """
+        return await self._call(sender=sender, name='decrypt', args=(keys, ciphertexts))
+
+    async def _call(self, sender: str, name: str, args: tuple) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if len(self.__pending) == 0:
+            # flush after all tasks in this round queued
+            loop.call_soon(self._flush)
+        self.__pending.append((name, args, future))
+        # tasks run in parallel, but return in the order of calling for the same sender
+        previous = self.__tails.get(sender)
+        done = loop.create_future()
+        self.__tails[sender] = done
+        try:
+            result = await future
+            if previous is not None:
+                await previous
+            return result
+        finally:
+            done.set_result(None)
+            if self.__tails.get(sender) is done:
+                self.__tails.pop(sender, None)
+
+    def _flush(self):
+        pending = self.__pending
+        if len(pending) == 0:
+            return
+        self.__pending = []
+        if self.__executor is None:
+            # the bot is multithreaded, don't fork it
+            context = multiprocessing.get_context('forkserver')
+            self.__executor = ProcessPoolExecutor(max_workers=self.__workers, mp_context=context,
+                                                  initializer=_init_worker)
+        executor = self.__executor
+        # spread tasks to all workers, but not too many for each
+        size = (len(pending) + self.__workers - 1) // self.__workers
+        size = max(1, min(size, self.__batch))
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            tasks = [(name, args) for name, args, _ in chunk]
+            try:
+                job = loop.run_in_executor(executor, _run_batch, tasks)
+            except Exception as error:
+                # executor broken or shutdown
+                job = loop.create_future()
+                job.set_exception(error)
+            job.add_done_callback(lambda fut, items=chunk: self._finish(job=fut, items=items, executor=executor))
+
+    def _finish(self, job: asyncio.Future, items: List[Tuple[str, tuple, asyncio.Future]],
+                executor: ProcessPoolExecutor):
+        error = job.exception()
+        if error is not None:
+            self.error(msg='crypto batch failed: %d task(s), %s' % (len(items), error))
+            if isinstance(error, BrokenProcessPool) and self.__executor is executor:
+                # create a new one for next tasks
+                self.shutdown()
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, _, future), result in zip(items, job.result()):
+            if not future.done():
+                future.set_result(result)
+
+    def shutdown(self):
+        executor = self.__executor
+        if executor is not None:
+            self.__executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+@Singleton
+class CryptoManager(Logging):
+    """ Crypto pool from config, disabled when workers not set """
+
+    def __init__(self):
+        super().__init__()
+        self.__config: Optional[Config] = None
+        self.__pool: Optional[CryptoPool] = None
+
+    @property
+    def pool(self) -> Optional[CryptoPool]:
+        return self.__pool
+
+    @property
+    def config(self) -> Optional[Config]:
+        return self.__config
+
+    @config.setter
+    def config(self, conf: Config):
+        self.__config = conf
+        options = conf.get_section(section='packer')
+        if options is None:
+            return
+        workers = options.get('workers')
+        workers = 0 if workers is None else int(workers)
+        if workers <= 0:
+            return
+        batch = options.get('batch')
+        self.__pool = CryptoPool(workers=workers, batch=16 if batch is None else int(batch))
+        self.info(msg='crypto pool: workers=%d' % workers)
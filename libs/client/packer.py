@@ -23,19 +23,27 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional
+import time
+from typing import Optional, List, Dict
 
-from dimples import SymmetricKey
+from dimples import SymmetricKey, SymmetricAlgorithms
+from dimples import ID
 from dimples import InstantMessage, SecureMessage
 from dimples import FileContent
+from dimples import Base64Data
 
 from dimples.client import ClientMessagePacker
 
+from ..utils import sha256, hex_encode
+
 from .emitter import Emitter
 
 
 class ClientPacker(ClientMessagePacker):
 
+    # rotate the group message key after 7 days
+    GROUP_KEY_EXPIRES = 3600 * 24 * 7
+
     # Override
     async def encrypt_message(self, msg: InstantMessage) -> Optional[SecureMessage]:
         # make sure visa.key exists before encrypting message
@@ -48,19 +56,92 @@ class ClientPacker(ClientMessagePacker):
                 await send_file_message(msg=msg, password=key)
                 return None
         try:
+            receiver = msg.receiver
+            if receiver.is_group and not receiver.is_broadcast:
+                # reuse group message keys
+                return await self._encrypt_group_message(msg=msg)
             s_msg = await super().encrypt_message(msg=msg)
         except Exception as error:
             self.error(msg='failed to encrypt message: %s' % error)
             return None
-        # receiver = msg.receiver
-        # if receiver.is_group:
-        #     # reuse group message keys
-        #     messenger = self.messenger
-        #     key = messenger.cipher_key(sender=msg.sender, receiver=receiver)
-        #     key['reused'] = True
-        # # TODO: reuse personal message key?
+        # TODO: reuse personal message key?
+        return s_msg
+
+    async def _encrypt_group_message(self, msg: InstantMessage) -> Optional[SecureMessage]:
+        """ encrypt the message key for new members only, reuse the ones encrypted before """
+        if not await self._check_receiver(msg=msg):
+            self.warning(msg='receiver not ready: %s' % msg.receiver)
+            return None
+        group = msg.receiver
+        sender = msg.sender
+        members = await self.facebook.get_members(identifier=group)
+        if members is None or len(members) == 0:
+            self.error(msg='group not ready: %s' % group)
+            return None
+        messenger = self.messenger
+        database = messenger.database
+        # 1. get message key, rotate it when expired or member removed
+        password = await messenger.get_encrypt_key(msg=msg)
+        if password is None:
+            return None
+        table = await database.get_group_keys(group=group, sender=sender)
+        pwd = await messenger.serialize_key(key=password, msg=msg)
+        digest = key_digest(data=pwd)
+        cached = member_keys(table=table, digest=digest)
+        if cached is not None and self._should_rotate(table=table, cached=cached, members=members):
+            self.info(msg='rotate group message key: %s => %s' % (sender, group))
+            password = SymmetricKey.generate(algorithm=SymmetricAlgorithms.AES)
+            await messenger.key_cache.cache_cipher_key(key=password, sender=sender, receiver=group)
+            pwd = await messenger.serialize_key(key=password, msg=msg)
+            digest = key_digest(data=pwd)
+            cached = None
+        # 2. encrypt content
+        body = await messenger.serialize_content(content=msg.content, key=password, msg=msg)
+        ciphertext = await messenger.encrypt_content(data=body, key=password, msg=msg)
+        # 3. encrypt message key for members not cached
+        keys: Dict[str, str] = {}
+        count = 0
+        for member in members:
+            encoded = None if cached is None else cached.get(member)
+            if encoded is None:
+                bundle = await messenger.encrypt_key(data=pwd, receiver=member, msg=msg)
+                if bundle is None or bundle.is_empty:
+                    # public key for encryption not found
+                    continue
+                encoded = await messenger.encode_key(bundle=bundle, receiver=member, msg=msg)
+                if encoded is None or len(encoded) == 0:
+                    continue
+                count += 1
+            keys.update(encoded)
+        if count > 0:
+            # save for next message, keep the time when the key was created,
+            # as the table overwrites it when merging
+            info = keys.copy()
+            info['digest'] = digest
+            created = None if cached is None else table.get('time')
+            info['time'] = str(time.time()) if created is None else created
+            await database.save_group_keys(group=group, sender=sender, keys=info)
+        self.debug(msg='group message keys: %d reused, %d encrypted => %s' % (len(members) - count, count, group))
+        # 4. pack secure message
+        info = msg.copy_dict()
+        info.pop('content', None)
+        info['data'] = Base64Data.create(binary=ciphertext).serialize()
+        info['keys'] = keys
+        s_msg = SecureMessage.parse(msg=info)
+        # copy content type to envelope
+        s_msg.envelope.type = msg.content.type
         return s_msg
 
+    def _should_rotate(self, table: Dict[str, str], cached: Dict[ID, Dict[str, str]], members: List[ID]) -> bool:
+        """ a removed member must not read the following messages, and keys should not live forever """
+        created = table.get('time')
+        if created is None or float(created) + self.GROUP_KEY_EXPIRES < time.time():
+            return True
+        for member in cached:
+            if member not in members:
+                return True
+        return False
+
     # Override
     async def decrypt_message(self, msg: SecureMessage) -> Optional[InstantMessage]:
         i_msg = await super().decrypt_message(msg=msg)
@@ -78,3 +159,28 @@ class ClientPacker(ClientMessagePacker):
 async def send_file_message(msg: InstantMessage, password: SymmetricKey):
     emitter = Emitter()
     return await emitter.send_file_message(msg=msg, password=password)
+
+
+def key_digest(data: bytes) -> str:
+    """ short digest for the serialized message key """
+    return hex_encode(data=sha256(data=data))[-16:]
+
+
+def member_keys(table: Optional[Dict[str, str]], digest: str) -> Optional[Dict[ID, Dict[str, str]]]:
+    """ encoded keys for each member from group keys table with the same digest """
+    if table is None or table.get('digest') != digest:
+        return None
+    keys: Dict[ID, Dict[str, str]] = {}
+    for name in table:
+        if name in ('digest', 'time'):
+            continue
+        # 'ID' or 'ID/terminal'
+        member = ID.parse(identifier=name.split('/')[0])
+        if member is None:
+            continue
+        encoded = keys.get(member)
+        if encoded is None:
+            encoded = {}
+            keys[member] = encoded
+        encoded[name] = table[name]
+    return keys
@@ -28,15 +28,22 @@ from typing import Optional
 
 from dimples import DateTime
 from dimples import EntityType, ID
+from dimples import Visa
 from dimples import Content, Envelope
 from dimples import CommonFacebook
 from dimples import DocumentUtils
 
 from ..utils import Log
+from ..utils import LRUCache, LRUCacheManager
 
 
 class RequestFilter:
 
+    # shared caches, the entries for an ID will be erased when its document updated
+    CACHE_CAPACITY = 4096
+    CACHE_EXPIRES = 3600       # seconds
+    CACHE_EMPTY_EXPIRES = 60   # seconds for negative results
+
     def __init__(self, facebook: CommonFacebook):
         super().__init__()
         self.__facebook = weakref.ref(facebook)
@@ -45,12 +52,33 @@ class RequestFilter:
     def facebook(self) -> Optional[CommonFacebook]:
         return self.__facebook()
 
+    @classmethod
+    def _get_cache(cls, name: str) -> LRUCache:
+        man = LRUCacheManager()
+        return man.get_cache(name=name, capacity=cls.CACHE_CAPACITY,
+                             life_span=cls.CACHE_EXPIRES, empty_life_span=cls.CACHE_EMPTY_EXPIRES)
+
+    async def get_visa(self, identifier: ID) -> Optional[Visa]:
+        cache = self._get_cache(name='visa')
+        visa, found = cache.fetch(key=identifier)
+        if not found:
+            visa = await self.facebook.get_visa(user=identifier)
+            cache.put(key=identifier, value=visa)
+        return visa
+
     async def get_nickname(self, identifier: ID) -> Optional[str]:
-        facebook = self.facebook
-        visa = await facebook.get_visa(user=identifier)
+        cache = self._get_cache(name='nickname')
+        name, found = cache.fetch(key=identifier)
+        if not found:
+            name = await self._load_nickname(identifier=identifier)
+            cache.put(key=identifier, value=name)
+        return name
+
+    async def _load_nickname(self, identifier: ID) -> Optional[str]:
+        visa = await self.get_visa(identifier=identifier)
         if visa is not None:
             return visa.name
-        doc = await facebook.get_document(identifier=identifier)
+        doc = await self.facebook.get_document(identifier=identifier)
         if doc is not None:
             return DocumentUtils.get_document_name(document=doc)
 
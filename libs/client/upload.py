@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    File Uploading
+    ~~~~~~~~~~~~~~
+
+    Content-addressed local cache for file data, and a worker pool uploading
+    encrypted data to CDN with a pluggable uploader; a local HTTP server with
+    the same upload API is provided for testing.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from email.policy import default as email_policy
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+from typing import Optional, Callable, Awaitable, Dict
+
+import requests
+
+from dimples import ID
+from dimples.database import Storage
+
+from ..utils import md5, hex_encode, utf8_encode, utf8_decode
+from ..utils import random_bytes
+from ..utils import json_encode, json_decode
+from ..utils import Config
+from ..utils import Singleton, Logging
+from ..utils import SingleFlight
+
+
+class FileCache:
+    """
+        Content-addressed cache
+
+            {root}/{xx}/{filename}       - file data, filename is the MD5 of data
+            {root}/index/{xx}/{key}.js   - uploaded info: {"url": "...", "params": {"IV": "..."}}
+    """
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.__root = root
+
+    @property
+    def root(self) -> str:
+        return self.__root
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.__root, filename[:2], filename)
+
+    def temp_path(self, filename: str) -> str:
+        """ path for encrypted data waiting for uploading """
+        return os.path.join(self.__root, 'temp', filename)
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.__root, 'index', key[:2], '%s.js' % key)
+
+    @classmethod
+    def _write(cls, path: str, data: bytes) -> int:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = '%s.%d.tmp' % (path, os.getpid())
+        with open(temp, 'wb') as file:
+            size = file.write(data)
+        os.replace(temp, path)
+        return size
+
+    @classmethod
+    def _read(cls, path: str) -> Optional[bytes]:
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            return file.read()
+
+    async def save(self, data: bytes, filename: str) -> int:
+        """ save file data, skip when same file exists """
+        path = self.path(filename=filename)
+        if os.path.exists(path) and os.path.getsize(path) == len(data):
+            return len(data)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._write, path, data)
+
+    async def save_file(self, src: str, filename: str) -> int:
+        """ copy file by chunks, skip when same file exists """
+        path = self.path(filename=filename)
+        size = os.path.getsize(src)
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            return size
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._copy, src, path)
+
+    @classmethod
+    def _copy(cls, src: str, path: str) -> int:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = '%s.%d.tmp' % (path, os.getpid())
+        shutil.copyfile(src, temp)
+        os.replace(temp, path)
+        return os.path.getsize(path)
+
+    async def load(self, filename: str) -> Optional[bytes]:
+        path = self.path(filename=filename)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._read, path)
+
+    def get_record(self, key: str) -> Optional[Dict]:
+        """ get uploaded info """
+        data = self._read(path=self._index_path(key=key))
+        if data is not None:
+            return json_decode(string=utf8_decode(data=data))
+
+    def set_record(self, key: str, info: Dict):
+        self._write(path=self._index_path(key=key), data=utf8_encode(string=json_encode(container=info)))
+
+
+#
+#   Uploaders
+#
+
+
+class Uploader(ABC):
+    """ Upload encrypted data to CDN """
+
+    @abstractmethod
+    async def upload(self, data: bytes, filename: str, sender: ID) -> Optional[str]:
+        """ return download URL """
+        raise NotImplemented
+
+    async def upload_file(self, path: str, filename: str, sender: ID) -> Optional[str]:
+        """ upload data from file """
+        with open(path, 'rb') as file:
+            data = file.read()
+        return await self.upload(data=data, filename=filename, sender=sender)
+
+
+class HttpUploader(Uploader):
+    """
+        Upload API:
+
+            POST "https://sechat.dim.chat/{ID}/upload?md5={MD5}&salt={SALT}"
+                multipart field 'file'
+                MD5 = md5(data + secret + salt)
+
+            response: {"url": "..."}
+    """
+
+    def __init__(self, api: str, secret: str, timeout: float = 60):
+        super().__init__()
+        self.__api = api
+        self.__secret = utf8_encode(string=secret)
+        self.__timeout = timeout
+
+    def _post(self, data, digest: bytes, salt: bytes, filename: str, sender: ID) -> Optional[str]:
+        url = self.__api.replace('{ID}', str(sender.address))
+        url = url.replace('{MD5}', hex_encode(data=digest)).replace('{SALT}', hex_encode(data=salt))
+        response = requests.post(url=url, files={'file': (filename, data)}, timeout=self.__timeout)
+        response.raise_for_status()
+        info = response.json()
+        return info.get('url') if isinstance(info, Dict) else None
+
+    def _post_file(self, path: str, filename: str, sender: ID) -> Optional[str]:
+        salt = random_bytes(size=16)
+        hasher = hashlib.md5()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                hasher.update(chunk)
+            hasher.update(self.__secret + salt)
+            file.seek(0)
+            return self._post(data=file, digest=hasher.digest(), salt=salt, filename=filename, sender=sender)
+
+    # Override
+    async def upload(self, data: bytes, filename: str, sender: ID) -> Optional[str]:
+        salt = random_bytes(size=16)
+        digest = md5(data=data + self.__secret + salt)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._post, data, digest, salt, filename, sender)
+
+    # Override
+    async def upload_file(self, path: str, filename: str, sender: ID) -> Optional[str]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._post_file, path, filename, sender)
+
+
+class LocalUploader(Uploader):
+    """ Save into a directory served by local HTTP server (for testing) """
+
+    def __init__(self, root: str, base_url: str):
+        super().__init__()
+        self.__cache = FileCache(root=root)
+        self.__base = base_url.rstrip('/')
+
+    # Override
+    async def upload(self, data: bytes, filename: str, sender: ID) -> Optional[str]:
+        await self.__cache.save(data=data, filename=filename)
+        return '%s/%s/%s' % (self.__base, filename[:2], filename)
+
+    # Override
+    async def upload_file(self, path: str, filename: str, sender: ID) -> Optional[str]:
+        await self.__cache.save_file(src=path, filename=filename)
+        return '%s/%s/%s' % (self.__base, filename[:2], filename)
+
+
+class LocalUploadServer(Logging):
+    """
+        Local HTTP stand-in for the upload API (for testing):
+
+            POST "http://{host}:{port}/{ID}/upload?md5={MD5}&salt={SALT}"
+                multipart field 'file', checked with the same secret
+
+            GET "http://{host}:{port}/download/{filename}"
+    """
+
+    def __init__(self, root: str, secret: str, host: str = '127.0.0.1', port: int = 0):
+        super().__init__()
+        self.__cache = FileCache(root=root)
+        self.__secret = utf8_encode(string=secret)
+        self.__server = ThreadingHTTPServer((host, port), self._create_handler())
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def api(self) -> str:
+        """ for config '[uploader] api' """
+        return '%s/{ID}/upload?md5={MD5}&salt={SALT}' % self.base_url
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+            self.__thread.start()
+            self.info(msg='local upload server: %s' % self.base_url)
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__thread = None
+
+    def _save(self, query: str, content_type: str, body: bytes) -> Optional[str]:
+        """ check & save uploaded file, return filename """
+        params = parse_qs(query)
+        digest = params.get('md5', [''])[0]
+        salt = params.get('salt', [''])[0]
+        head = utf8_encode(string='Content-Type: %s\r\n\r\n' % content_type)
+        form = BytesParser(policy=email_policy).parsebytes(head + body)
+        for part in form.iter_parts():
+            if part.get_param(param='name', header='content-disposition') != 'file':
+                continue
+            filename = part.get_filename()
+            data = part.get_payload(decode=True)
+            if filename is None or data is None or '/' in filename:
+                return None
+            if hex_encode(data=md5(data=data + self.__secret + bytes.fromhex(salt))) != digest:
+                self.error(msg='upload digest not match: %s' % filename)
+                return None
+            self.__cache._write(self.__cache.path(filename=filename), data)
+            return filename
+
+    def _load(self, filename: str) -> Optional[bytes]:
+        if '/' in filename:
+            return None
+        return self.__cache._read(self.__cache.path(filename=filename))
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            # noinspection PyPep8Naming
+            def do_POST(self):
+                path, _, query = self.path.partition('?')
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                filename = None
+                if path.endswith('/upload'):
+                    try:
+                        filename = server._save(query=query, content_type=self.headers.get('Content-Type', ''),
+                                                body=body)
+                    except Exception as error:
+                        server.error(msg='failed to save upload: %s' % error)
+                if filename is None:
+                    self.send_error(403)
+                    return
+                url = '%s/download/%s' % (server.base_url, filename)
+                self._respond(data=utf8_encode(string=json_encode(container={'url': url})),
+                              content_type='application/json')
+
+            # noinspection PyPep8Naming
+            def do_GET(self):
+                prefix = '/download/'
+                data = server._load(filename=self.path[len(prefix):]) if self.path.startswith(prefix) else None
+                if data is None:
+                    self.send_error(404)
+                    return
+                self._respond(data=data, content_type='application/octet-stream')
+
+            def _respond(self, data: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            # Override
+            def log_message(self, fmt: str, *args):
+                server.debug(msg=fmt % args)
+
+        return Handler
+
+
+#
+#   Upload Pool
+#
+
+
+class UploadPool(Logging):
+    """ Upload with concurrency limit & retries """
+
+    def __init__(self, uploader: Optional[Uploader] = None, workers: int = 4, retries: int = 3,
+                 retry_delay: float = 2.0):
+        super().__init__()
+        self.__uploader = uploader
+        self.__workers = workers
+        self.__retries = retries
+        self.__retry_delay = retry_delay
+        self.__semaphore: Optional[asyncio.Semaphore] = None
+        self.__flight = SingleFlight()
+        self.__tasks = set()
+
+    @property
+    def uploader(self) -> Optional[Uploader]:
+        return self.__uploader
+
+    @uploader.setter
+    def uploader(self, delegate: Uploader):
+        self.__uploader = delegate
+
+    @property
+    def pending(self) -> int:
+        """ uploading & waiting """
+        return len(self.__flight)
+
+    async def upload(self, data: bytes, filename: str, sender: ID) -> Optional[str]:
+        """ upload with retries, return None on failed """
+        uploader = self.__uploader
+        if uploader is None:
+            return None
+        return await self._retry(filename=filename,
+                                 factory=lambda: uploader.upload(data=data, filename=filename, sender=sender))
+
+    async def upload_file(self, path: str, filename: str, sender: ID) -> Optional[str]:
+        """ upload file with retries, return None on failed """
+        uploader = self.__uploader
+        if uploader is None:
+            return None
+        return await self._retry(filename=filename,
+                                 factory=lambda: uploader.upload_file(path=path, filename=filename, sender=sender))
+
+    async def _retry(self, filename: str, factory: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__workers)
+        async with self.__semaphore:
+            delay = self.__retry_delay
+            for attempt in range(1, self.__retries + 1):
+                try:
+                    url = await factory()
+                    if url is not None:
+                        return url
+                    self.warning(msg='upload failed: %s, attempt %d' % (filename, attempt))
+                except Exception as error:
+                    self.error(msg='upload error: %s, attempt %d, %s' % (filename, attempt, error))
+                if attempt < self.__retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    def submit(self, data: bytes, filename: str, sender: ID, callback: Callable[[Optional[str]], Awaitable]) -> bool:
+        """
+        Upload in background, same file in flight will be uploaded once
+
+        :return: False when refused, the callback will still be called with None
+        """
+        if self.__uploader is None:
+            self.warning(msg='uploader not set, cannot upload: %s' % filename)
+            self._submit(key=filename, callback=callback, factory=_no_url)
+            return False
+
+        # same filename may come from different encrypted data, so use the digest
+        digest = hex_encode(data=md5(data=data))
+        return self._submit(key=digest, callback=callback,
+                            factory=lambda: self.upload(data=data, filename=filename, sender=sender))
+
+    def submit_file(self, path: str, digest: bytes, filename: str, sender: ID,
+                    callback: Callable[[Optional[str]], Awaitable]) -> bool:
+        """ upload file in background, digest is the MD5 of file data """
+        if self.__uploader is None:
+            self.warning(msg='uploader not set, cannot upload: %s' % filename)
+            self._submit(key=filename, callback=callback, factory=_no_url)
+            return False
+        return self._submit(key=hex_encode(data=digest), callback=callback,
+                            factory=lambda: self.upload_file(path=path, filename=filename, sender=sender))
+
+    def _submit(self, key: str, callback: Callable[[Optional[str]], Awaitable],
+                factory: Callable[[], Awaitable[Optional[str]]]) -> bool:
+
+        async def run():
+            url = await self.__flight.run(key=key, factory=factory)
+            await callback(url)
+
+        task = asyncio.ensure_future(run())
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+        return True
+
+
+async def _no_url() -> Optional[str]:
+    """ fail fast when nothing can upload """
+    return None
+
+
+@Singleton
+class UploadManager(Logging):
+    """ File cache & upload pool from config """
+
+    def __init__(self):
+        super().__init__()
+        self.__config: Optional[Config] = None
+        self.__cache: Optional[FileCache] = None
+        self.__pool = UploadPool()
+
+    @property
+    def cache(self) -> Optional[FileCache]:
+        return self.__cache
+
+    @property
+    def pool(self) -> UploadPool:
+        return self.__pool
+
+    @property
+    def config(self) -> Optional[Config]:
+        return self.__config
+
+    @config.setter
+    def config(self, conf: Config):
+        self.__config = conf
+        options = conf.get_section(section='uploader')
+        if options is None:
+            options = {}
+        root = options.get('cache')
+        if root is None:
+            # large files always go through the cache by chunks
+            root = Storage(config=conf).protected_path('{PROTECTED}/files')
+        self.__cache = FileCache(root=root)
+        api = options.get('api')
+        secret = options.get('secret')
+        workers = options.get('workers')
+        retries = options.get('retries')
+        uploader = None
+        if api is not None and secret is not None:
+            uploader = HttpUploader(api=api, secret=secret)
+        self.__pool = UploadPool(uploader=uploader,
+                                 workers=4 if workers is None else int(workers),
+                                 retries=3 if retries is None else int(retries))
+        self.info(msg='uploader: cache=%s, api=%s' % (root, api))
+
+    @classmethod
+    def record_key(cls, digest: bytes, password: Dict) -> str:
+        """ key for uploaded info: (MD5 of file data, encrypt key) """
+        key = utf8_encode(string=json_encode(container=password))
+        return hex_encode(data=md5(data=digest + md5(data=key)))
@@ -72,6 +72,7 @@ __all__ = [
     'GroupCache', 'GroupHistoryCache', 'GroupKeysCache',
     'MessageCache',
     'StationCache',
+    'BulkMetaCache', 'BulkDocumentCache',
 
     #
     #   Database
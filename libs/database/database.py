@@ -29,7 +29,7 @@
 
 """
 
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, Iterable, List, Dict
 
 from dimples import SymmetricKey, PrivateKey, SignKey, DecryptKey
 from dimples import ID, Meta, Document
@@ -37,18 +37,33 @@ from dimples import ReliableMessage
 from dimples import LoginCommand, GroupCommand, ResetCommand
 from dimples import AccountDBI, MessageDBI, SessionDBI
 from dimples import ProviderInfo, StationInfo
-from dimples import MetaUtils
+from dimples import MetaUtils, DocumentUtils
+from dimples import TransportableData
 from dimples.utils import Config
 from dimples.database import PrivateKeyTable
 from dimples.database import CipherKeyTable
+from dimples.database import GroupKeysTable
 from dimples.database import MetaTable
 from dimples.database import DocumentTable
 from dimples.database import GroupTable
 from dimples.database import GroupHistoryTable
+from dimples.database import Storage
+
+from ..utils import LRUCache, LRUCacheManager
+from ..utils import SupervisorCache
+
+from .redis import BulkMetaCache, BulkDocumentCache
+from .outbox import OutboxTable
+from .verified import SignatureCache
 
 
 class Database(AccountDBI, MessageDBI, SessionDBI):
 
+    # read-through caches for meta & documents, shown in 'caches'
+    CACHE_CAPACITY = 10240
+    CACHE_EXPIRES = 3600       # seconds
+    CACHE_EMPTY_EXPIRES = 60   # seconds for unknown IDs
+
     def __init__(self, config: Config):
         super().__init__()
         self.__users = []
@@ -57,12 +72,26 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
         self.__private_table = PrivateKeyTable(config=config)
         self.__meta_table = MetaTable(config=config)
         self.__document_table = DocumentTable(config=config)
+        path = Storage(config=config).protected_path('{PROTECTED}/verified_signatures.js')
+        self.__signatures = SignatureCache(path=path)
         self.__group_table = GroupTable(config=config)
         self.__history_table = GroupHistoryTable(config=config)
         # Message
         self.__cipherkey_table = CipherKeyTable(config=config)
+        self.__group_keys_table = GroupKeysTable(config=config)
+        self.__outbox = create_outbox(config=config)
         # # ANS
         # self.__ans_table = AddressNameTable(info=info)
+        # Redis, shared by the tables above when '[redis] enable = on'
+        self.__redis_enabled = config.get_boolean(section='redis', option='enable')
+        self.__meta_bulk = BulkMetaCache(config=config)
+        self.__document_bulk = BulkDocumentCache(config=config)
+
+    @classmethod
+    def _get_cache(cls, name: str) -> LRUCache:
+        man = LRUCacheManager()
+        return man.get_cache(name=name, capacity=cls.CACHE_CAPACITY,
+                             life_span=cls.CACHE_EXPIRES, empty_life_span=cls.CACHE_EMPTY_EXPIRES)
 
     def show_info(self):
         # Entity
@@ -72,8 +101,15 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
         self.__group_table.show_info()
         self.__history_table.show_info()
         self.__cipherkey_table.show_info()
+        self.__group_keys_table.show_info()
+        self.__outbox.show_info()
         # # ANS
         # self.__ans_table.show_info()
+        print('!!!               redis: %s' % ('enabled' if self.__redis_enabled else 'disabled'))
+
+    async def flush(self):
+        """ save pending changes of the local caches before stopping """
+        await self.__signatures.flush()
 
     """
         Private Key file for Users
@@ -111,11 +147,24 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
     async def save_meta(self, meta: Meta, identifier: ID) -> bool:
         if not MetaUtils.match_id(identifier=identifier, meta=meta):
             raise AssertionError('meta not match ID: %s' % identifier)
-        return await self.__meta_table.save_meta(meta=meta, identifier=identifier)
+        old = await self.get_meta(identifier=identifier)
+        ok = await self.__meta_table.save_meta(meta=meta, identifier=identifier)
+        if ok:
+            # replace the cached one (or the empty result)
+            self._get_cache(name='meta').put(key=identifier, value=meta)
+            if old is not None and old.public_key.get('data') != meta.public_key.get('data'):
+                # meta key changed, forget the signatures verified with the old one
+                await self.__signatures.erase(identifier=identifier)
+        return ok
 
     # Override
     async def get_meta(self, identifier: ID) -> Optional[Meta]:
-        return await self.__meta_table.get_meta(identifier=identifier)
+        cache = self._get_cache(name='meta')
+        meta, found = cache.fetch(key=identifier)
+        if not found:
+            meta = await self.__meta_table.get_meta(identifier=identifier)
+            cache.put(key=identifier, value=meta)
+        return meta
 
     """
         Document for Accounts
@@ -132,12 +181,61 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
         meta = await self.get_meta(identifier=identifier)
         assert meta is not None, 'meta not exists: %s' % document
         # check document valid before saving it
-        if document.is_valid or document.verify(public_key=meta.public_key):
-            return await self.__document_table.save_document(document=document, identifier=identifier)
+        if not document.is_valid:
+            document = await self._verify_document(document=document, meta=meta, identifier=identifier)
+        if document is not None:
+            ok = await self.__document_table.save_document(document=document, identifier=identifier)
+            if ok:
+                # document updated, remove cached documents, visa & name
+                LRUCacheManager().erase(key=identifier)
+                SupervisorCache().invalidate(identifier=identifier)
+            return ok
+
+    async def _verify_document(self, document: Document, meta: Meta, identifier: ID) -> Optional[Document]:
+        """ verify with meta key, skip it if the same signature verified before """
+        cache = self.__signatures
+        digest = cache.digest(document=document, meta=meta)
+        if digest is not None and await cache.contains(digest=digest):
+            # create with data & signature, it's trusted as loaded from local storage
+            doc_type = DocumentUtils.get_document_type(document=document)
+            trusted = Document.create(doc_type=doc_type, data=document.get('data'),
+                                      signature=TransportableData.parse(document.get('signature')))
+            for key in document:
+                if key not in trusted:
+                    trusted[key] = document[key]
+            return trusted
+        if document.verify(public_key=meta.public_key):
+            if digest is not None:
+                await cache.add(digest=digest, identifier=identifier)
+            return document
 
     # Override
     async def get_documents(self, identifier: ID) -> List[Document]:
-        return await self.__document_table.get_documents(identifier=identifier)
+        cache = self._get_cache(name='documents')
+        docs, found = cache.fetch(key=identifier)
+        if not found:
+            docs = await self.__document_table.get_documents(identifier=identifier)
+            # cache empty list as None, so it expires sooner
+            cache.put(key=identifier, value=docs if len(docs) > 0 else None)
+        # copy it, keep the cached one unchanged
+        return [] if docs is None else list(docs)
+
+    async def prefetch(self, identifiers: Iterable[ID]) -> int:
+        """ load meta & documents of many IDs from redis into the caches, return count of IDs loaded """
+        if not self.__redis_enabled:
+            return 0
+        array = list(dict.fromkeys(identifiers))
+        # meta
+        cache = self._get_cache(name='meta')
+        metas = await self.__meta_bulk.get_metas(identifiers=[did for did in array if did not in cache])
+        for did, meta in metas.items():
+            cache.put(key=did, value=meta)
+        # documents
+        cache = self._get_cache(name='documents')
+        docs = await self.__document_bulk.get_documents_list(identifiers=[did for did in array if did not in cache])
+        for did, documents in docs.items():
+            cache.put(key=did, value=documents if len(documents) > 0 else None)
+        return len(set(metas.keys()) | set(docs.keys()))
 
     """
         User contacts
@@ -245,7 +343,11 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
 
     # Override
     async def save_members(self, members: List[ID], group: ID) -> bool:
-        return await self.__group_table.save_members(members=members, group=group)
+        ok = await self.__group_table.save_members(members=members, group=group)
+        if ok:
+            # group members updated, reload supervisors
+            SupervisorCache().invalidate(identifier=group)
+        return ok
 
     # Override
     async def get_administrators(self, group: ID) -> List[ID]:
@@ -283,24 +385,25 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
         Reliable message for Receivers
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        redis key: 'dkd.msg.{ID}.{sig}'
-        redis key: 'dkd.msg.{ID}.messages'
+        suspended while the session is not ready, kept in memory,
+        the overflow spills into: '{outbox.spill}/{ADDRESS}.js'
     """
 
+    async def get_outbox_receivers(self) -> List[ID]:
+        """ receivers with suspended messages """
+        return self.__outbox.receivers
+
     # Override
     async def get_reliable_messages(self, receiver: ID, limit: int = 1024) -> List[ReliableMessage]:
-        # TODO: get cached reliable messages
-        return []
+        return await self.__outbox.get_reliable_messages(receiver=receiver, limit=limit)
 
     # Override
     async def cache_reliable_message(self, msg: ReliableMessage, receiver: ID) -> bool:
-        # TODO: cache reliable messages
-        return True
+        return await self.__outbox.cache_reliable_message(msg=msg, receiver=receiver)
 
     # Override
     async def remove_reliable_message(self, msg: ReliableMessage, receiver: ID) -> bool:
-        # TODO: remove sent reliable message
-        return True
+        return await self.__outbox.remove_reliable_message(msg=msg, receiver=receiver)
 
     """
         Message Keys
@@ -317,15 +420,21 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
     async def cache_cipher_key(self, key: SymmetricKey, sender: ID, receiver: ID):
         return await self.__cipherkey_table.cache_cipher_key(key=key, sender=sender, receiver=receiver)
 
+    """
+        Group Keys
+        ~~~~~~~~~~
+
+        file path: '.dim/protected/{GROUP_ADDRESS}/{SENDER_ADDRESS}.keys.js'
+        redis key: 'dkd.group.{GROUP}.{SENDER}.encrypted-keys'
+    """
+
     # Override
     async def get_group_keys(self, group: ID, sender: ID) -> Optional[Dict[str, str]]:
-        # TODO: get group keys
-        pass
+        return await self.__group_keys_table.get_group_keys(group=group, sender=sender)
 
     # Override
     async def save_group_keys(self, group: ID, sender: ID, keys: Dict[str, str]) -> bool:
-        # TODO: save group keys
-        pass
+        return await self.__group_keys_table.save_group_keys(group=group, sender=sender, keys=keys)
 
     # """
     #     Address Name Service
@@ -412,3 +521,17 @@ class Database(AccountDBI, MessageDBI, SessionDBI):
     async def remove_stations(self, provider: ID) -> bool:
         # TODO: remove all stations for ISP
         return True
+
+
+def create_outbox(config: Config) -> OutboxTable:
+    """ outbox with options in section '[outbox]' """
+    section = config.get_section(section='outbox')
+    if section is None:
+        return OutboxTable()
+    memory = section.get('memory')
+    capacity = section.get('capacity')
+    expires = section.get('expires')
+    return OutboxTable(memory=256 if memory is None else int(memory),
+                       capacity=4096 if capacity is None else int(capacity),
+                       spill=section.get('spill'),
+                       expires=3600 * 24 if expires is None else float(expires))
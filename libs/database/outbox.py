@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Outbox
+    ~~~~~~
+
+    Reliable messages suspended while the session is not ready,
+    kept for each receiver in memory, the overflow spills into a file.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+from dimples import ID, ReliableMessage
+from dimples.common.dbi import ReliableMessageDBI
+
+from ..utils import json_encode, json_decode
+from ..utils import Logging
+
+
+class OutboxQueue:
+    """ Messages for one receiver, oldest first """
+
+    __slots__ = ('memory', 'spilled')
+
+    def __init__(self):
+        super().__init__()
+        # signature => message
+        self.memory: Dict[str, ReliableMessage] = OrderedDict()
+        # count of messages in the spill file (newer than those in memory)
+        self.spilled = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.memory) + self.spilled
+
+
+class OutboxTable(ReliableMessageDBI, Logging):
+    """ Bounded store of suspended messages for each receiver """
+
+    def __init__(self, memory: int = 256, capacity: int = 4096, spill: Optional[str] = None,
+                 expires: float = 3600 * 24):
+        """
+        Create outbox
+
+        :param memory:   max messages in memory for each receiver (when spill is set)
+        :param capacity: max messages for each receiver, the newer ones will be dropped
+        :param spill:    directory for the overflow, None means keeping all in memory
+        :param expires:  seconds to keep a message
+        """
+        super().__init__()
+        self.__memory = memory if spill is not None else capacity
+        self.__capacity = capacity
+        self.__spill = spill
+        self.__expires = expires
+        self.__queues: Dict[ID, OutboxQueue] = {}
+        self.__lock = threading.Lock()
+        if spill is not None:
+            self._restore()
+
+    def show_info(self):
+        print('!!!         outbox path: %s' % self.__spill)
+
+    @property
+    def receivers(self) -> List[ID]:
+        with self.__lock:
+            return list(self.__queues.keys())
+
+    @property
+    def count(self) -> int:
+        with self.__lock:
+            return sum([queue.count for queue in self.__queues.values()])
+
+    def _restore(self):
+        """ rebuild queues from the spill files left by last run """
+        if not os.path.isdir(self.__spill):
+            return
+        for name in os.listdir(self.__spill):
+            if not name.endswith('.js'):
+                continue
+            path = os.path.join(self.__spill, name)
+            try:
+                with open(path, 'r') as file:
+                    lines = file.readlines()
+                receiver = ID.parse(identifier=json_decode(string=lines[0]).get('receiver'))
+            except Exception as error:
+                self.error(msg='failed to restore outbox: %s, %s' % (path, error))
+                continue
+            if receiver is not None:
+                queue = OutboxQueue()
+                queue.spilled = len(lines)
+                self.__queues[receiver] = queue
+                self.info(msg='restored %d messages for %s' % (len(lines), receiver))
+
+    def _spill_path(self, receiver: ID) -> str:
+        return os.path.join(self.__spill, '%s.js' % receiver.address)
+
+    def _spill_message(self, msg: ReliableMessage, receiver: ID, queue: OutboxQueue) -> bool:
+        path = self._spill_path(receiver=receiver)
+        try:
+            os.makedirs(self.__spill, exist_ok=True)
+            with open(path, 'a') as file:
+                file.write(json_encode(container=msg.to_dict()))
+                file.write('\n')
+        except Exception as error:
+            self.error(msg='failed to spill message: %s, %s' % (path, error))
+            return False
+        queue.spilled += 1
+        return True
+
+    def _load_spilled(self, receiver: ID, queue: OutboxQueue, count: int):
+        """ move the oldest messages from the spill file into memory """
+        path = self._spill_path(receiver=receiver)
+        try:
+            with open(path, 'r') as file:
+                lines = file.readlines()
+            rest = lines[count:]
+            if len(rest) == 0:
+                os.remove(path)
+            else:
+                temp = '%s.tmp' % path
+                with open(temp, 'w') as file:
+                    file.writelines(rest)
+                os.replace(temp, path)
+        except Exception as error:
+            self.error(msg='failed to load spilled messages: %s, %s' % (path, error))
+            queue.spilled = 0
+            return
+        queue.spilled = len(rest)
+        for line in lines[:count]:
+            msg = ReliableMessage.parse(msg=json_decode(string=line))
+            if msg is not None:
+                queue.memory[msg.get('signature')] = msg
+
+    def _purge(self, queue: OutboxQueue, now: float):
+        expired = now - self.__expires
+        memory = queue.memory
+        for sig in [sig for sig, msg in memory.items() if msg.time is None or msg.time < expired]:
+            memory.pop(sig, None)
+
+    #
+    #   ReliableMessageDBI
+    #
+
+    # Override
+    async def get_reliable_messages(self, receiver: ID, limit: int = 1024) -> List[ReliableMessage]:
+        with self.__lock:
+            queue = self.__queues.get(receiver)
+            if queue is None:
+                return []
+            if queue.spilled > 0 and len(queue.memory) < self.__memory:
+                self._load_spilled(receiver=receiver, queue=queue, count=self.__memory - len(queue.memory))
+            self._purge(queue=queue, now=time.time())
+            if queue.count == 0:
+                self.__queues.pop(receiver, None)
+            return list(queue.memory.values())[:limit]
+
+    # Override
+    async def cache_reliable_message(self, msg: ReliableMessage, receiver: ID) -> bool:
+        sig = msg.get('signature')
+        with self.__lock:
+            queue = self.__queues.get(receiver)
+            if queue is None:
+                queue = OutboxQueue()
+                self.__queues[receiver] = queue
+            elif sig in queue.memory:
+                return True
+            if queue.count >= self.__capacity:
+                self.warning(msg='outbox full, drop message: %s => %s' % (msg.sender, receiver))
+                return False
+            if queue.spilled == 0 and len(queue.memory) < self.__memory:
+                queue.memory[sig] = msg
+                return True
+            # keep the order, newer messages go to the spill file after the first one
+            return self._spill_message(msg=msg, receiver=receiver, queue=queue)
+
+    # Override
+    async def remove_reliable_message(self, msg: ReliableMessage, receiver: ID) -> bool:
+        with self.__lock:
+            queue = self.__queues.get(receiver)
+            if queue is None:
+                return False
+            msg = queue.memory.pop(msg.get('signature'), None)
+            if queue.count == 0:
+                self.__queues.pop(receiver, None)
+            return msg is not None
@@ -32,6 +32,8 @@
 
 from dimples.database.redis import *
 
+from .bulk import BulkMetaCache, BulkDocumentCache
+
 
 __all__ = [
 
@@ -43,4 +45,6 @@ __all__ = [
     'MessageCache',
     'StationCache',
 
+    'BulkMetaCache', 'BulkDocumentCache',
+
 ]
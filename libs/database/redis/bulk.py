@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Bulk Reading
+    ~~~~~~~~~~~~
+
+    Load meta & documents for many IDs with MGET, one round trip for each chunk,
+    sharing the same keys with MetaCache & DocumentCache.
+"""
+
+from typing import Iterable, List, Dict
+
+from dimples import ID, Meta, Document
+from dimples.utils import utf8_decode, json_decode
+from dimples.utils import Logging
+from dimples.common.compat import Compatible
+from dimples.database.dos.document import parse_document
+from dimples.database.redis import RedisCache, MetaCache, DocumentCache
+
+
+# max keys for one MGET
+MGET_CHUNK = 512
+
+
+def _cache_name(cache: RedisCache, identifier: ID) -> str:
+    return '%s.%s.%s' % (cache.db_name, cache.tbl_name, identifier)
+
+
+def _mget(cache: RedisCache, identifiers: List[ID]) -> Dict[ID, bytes]:
+    """ raw values found in redis """
+    redis = cache.redis
+    if redis is None:
+        return {}
+    results = {}
+    for start in range(0, len(identifiers), MGET_CHUNK):
+        array = identifiers[start:start+MGET_CHUNK]
+        values = redis.mget([_cache_name(cache=cache, identifier=did) for did in array])
+        for did, value in zip(array, values):
+            if value is not None:
+                results[did] = value
+    return results
+
+
+class BulkMetaCache(MetaCache, Logging):
+
+    async def get_metas(self, identifiers: Iterable[ID]) -> Dict[ID, Meta]:
+        """ metas found in redis """
+        results = {}
+        values = _mget(cache=self, identifiers=list(identifiers))
+        for did, value in values.items():
+            try:
+                info = json_decode(string=utf8_decode(data=value))
+                Compatible.fix_meta_version(meta=info)
+                meta = Meta.parse(meta=info)
+            except Exception as error:
+                self.error(msg='meta error: %s, %s' % (did, error))
+                continue
+            if meta is not None:
+                results[did] = meta
+        return results
+
+
+class BulkDocumentCache(DocumentCache, Logging):
+
+    async def get_documents_list(self, identifiers: Iterable[ID]) -> Dict[ID, List[Document]]:
+        """ documents found in redis """
+        results = {}
+        values = _mget(cache=self, identifiers=list(identifiers))
+        for did, value in values.items():
+            try:
+                info = json_decode(string=utf8_decode(data=value))
+            except Exception as error:
+                self.error(msg='documents error: %s, %s' % (did, error))
+                continue
+            if isinstance(info, Dict):
+                info = [info]
+            elif not isinstance(info, List):
+                continue
+            array = []
+            for item in info:
+                doc = parse_document(dictionary=item, identifier=did)
+                if doc is not None:
+                    array.append(doc)
+            results[did] = array
+        return results
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Verified Signatures
+    ~~~~~~~~~~~~~~~~~~~
+
+    Digests of (public key, document data, signature) verified before,
+    kept in a bounded table and saved into a file across restarts,
+    so the same visa will not be verified again.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from dimples import ID, Meta, Document
+from dimples.database import Storage
+
+from ..utils import sha256, hex_encode, utf8_encode
+from ..utils import Logging
+
+
+class SignatureCache(Logging):
+    """ Bounded table for verified document signatures """
+
+    # seconds between saving the table into file
+    FLUSH_INTERVAL = 60
+
+    def __init__(self, path: Optional[str], capacity: int = 10240):
+        super().__init__()
+        self.__path = path
+        self.__capacity = capacity
+        # digest => ID
+        self.__entries: Dict[str, str] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__loaded = path is None
+        self.__dirty = False
+        self.__flushed = time.time()
+        self.__flusher: Optional[asyncio.Task] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.__entries)
+
+    @classmethod
+    def digest(cls, document: Document, meta: Meta) -> Optional[str]:
+        data = document.get('data')
+        signature = document.get('signature')
+        if not isinstance(data, str) or not isinstance(signature, str):
+            return None
+        # the digest changes with the meta key, so a new meta invalidates it
+        key = meta.public_key.get('data')
+        text = '%s\n%s\n%s' % (key, data, signature)
+        return hex_encode(data=sha256(data=utf8_encode(string=text)))
+
+    async def _load(self):
+        if self.__loaded:
+            return
+        self.__loaded = True
+        info = await Storage.read_json(path=self.__path)
+        if isinstance(info, Dict):
+            with self.__lock:
+                for digest in info:
+                    self.__entries[digest] = info[digest]
+                while len(self.__entries) > self.__capacity:
+                    self.__entries.popitem(last=False)
+            self.info(msg='loaded %d verified signatures from %s' % (len(self.__entries), self.__path))
+
+    async def _flush(self, force: bool = False):
+        if self.__path is None or not self.__dirty:
+            return
+        now = time.time()
+        if not force and now < self.__flushed + self.FLUSH_INTERVAL:
+            return
+        with self.__lock:
+            container = dict(self.__entries)
+            self.__dirty = False
+            self.__flushed = now
+        await Storage.write_json(container=container, path=self.__path)
+
+    def _schedule_flush(self):
+        """ save the changes within FLUSH_INTERVAL even if nothing else comes """
+        if self.__path is None or self.__flusher is not None:
+            return
+        self.__flusher = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        try:
+            delay = self.__flushed + self.FLUSH_INTERVAL - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._flush(force=True)
+        except Exception as error:
+            self.error(msg='failed to save verified signatures: %s, %s' % (self.__path, error))
+        finally:
+            self.__flusher = None
+
+    async def flush(self):
+        """ save the changes now (e.g. before stopping) """
+        await self._flush(force=True)
+
+    async def contains(self, digest: str) -> bool:
+        await self._load()
+        with self.__lock:
+            entries = self.__entries
+            if digest not in entries:
+                return False
+            entries.move_to_end(digest)
+            return True
+
+    async def add(self, digest: str, identifier: ID):
+        await self._load()
+        with self.__lock:
+            entries = self.__entries
+            entries[digest] = str(identifier)
+            entries.move_to_end(digest)
+            while len(entries) > self.__capacity:
+                entries.popitem(last=False)
+            self.__dirty = True
+        self._schedule_flush()
+
+    async def erase(self, identifier: ID) -> int:
+        """ remove all digests for the ID (e.g. when its meta changed) """
+        await self._load()
+        name = str(identifier)
+        with self.__lock:
+            entries = self.__entries
+            keys = [digest for digest, did in entries.items() if did == name]
+            for digest in keys:
+                entries.pop(digest, None)
+            if len(keys) > 0:
+                self.__dirty = True
+        if len(keys) > 0:
+            self._schedule_flush()
+        return len(keys)
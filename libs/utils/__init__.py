@@ -46,9 +46,20 @@ from .md import md_user_url
 
 from .visa import get_name, get_locale
 from .admin import get_supervisors, md_supervisors
+from .admin import SupervisorCache
 
 from .datetime import yesterday, parse_time
 
+from .lru import LRUCache, LRUCacheManager
+from .iptable import ip_to_int, int_to_ip
+from .iptable import IPLocation, IPTable, IPLocator
+from .iptable import compile_ip_table
+
+from .report import ReportBuilder
+from .jobs import Job, JobRunner
+from .lanes import Lane, LaneScheduler
+from .throttle import SingleFlight, TokenBucket, RateLimiter
+
 
 __all__ = [
 
@@ -93,7 +104,18 @@ __all__ = [
 
     'get_name', 'get_locale',
     'get_supervisors', 'md_supervisors',
+    'SupervisorCache',
 
     'yesterday', 'parse_time',
 
+    'LRUCache', 'LRUCacheManager',
+    'ip_to_int', 'int_to_ip',
+    'IPLocation', 'IPTable', 'IPLocator',
+    'compile_ip_table',
+
+    'ReportBuilder',
+    'Job', 'JobRunner',
+    'Lane', 'LaneScheduler',
+    'SingleFlight', 'TokenBucket', 'RateLimiter',
+
 ]
@@ -23,7 +23,9 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Set, List
+import asyncio
+import time
+from typing import Optional, Tuple, Set, List, Dict
 from typing import Iterable
 
 from dimples import ID
@@ -31,6 +33,7 @@ from dimples import Facebook
 from dimples import CommonFacebook
 from dimples.utils import Config
 from dimples.utils import Supervisor
+from dimples.utils import Singleton, Logging
 
 
 """
@@ -42,18 +45,14 @@ from dimples.utils import Supervisor
 async def get_supervisors(config: Config, facebook: Facebook, section: str = 'system') -> Set[ID]:
     """ Get system administrators """
     assert facebook is not None, 'facebook not ready'
-    admin = Supervisor(facebook=facebook)
-    users = await admin.get_users(config=config, section=section)
-    if len(users) == 0 and section != 'system':
-        users = await admin.get_users(config=config, section='system')
-    return users
+    cache = SupervisorCache()
+    return await cache.get_users(config=config, facebook=facebook, section=section)
 
 
 async def md_supervisors(config: Config, facebook: CommonFacebook, section: str = 'system',) -> str:
     """ Build markdown format name list of supervisors """
-    supervisors = await get_supervisors(config=config, facebook=facebook, section=section)
-    lines = await md_user_name_list(users=supervisors, facebook=facebook)
-    return '\n'.join(lines)
+    cache = SupervisorCache()
+    return await cache.get_names(config=config, facebook=facebook, section=section)
 
 
 async def md_user_name_list(users: Iterable[ID], facebook: CommonFacebook) -> List[str]:
@@ -67,3 +66,115 @@ async def md_user_name_list(users: Iterable[ID], facebook: CommonFacebook) -> Li
         lines.append(text)
     # OK
     return lines
+
+
+async def _load_supervisors(config: Config, facebook: Facebook, section: str) -> Set[ID]:
+    admin = Supervisor(facebook=facebook)
+    users = await admin.get_users(config=config, section=section)
+    if len(users) == 0 and section != 'system':
+        users = await admin.get_users(config=config, section='system')
+    return users
+
+
+def _config_list(config: Config, section: str, option: str = 'supervisors') -> Tuple[str, ...]:
+    options = config.get_section(section=section)
+    text = None if options is None else options.get(option)
+    if text is None:
+        return ()
+    return tuple(item.strip() for item in text.split(',') if len(item.strip()) > 0)
+
+
+class _Supervisors:
+    """ Cached supervisors for a config section """
+
+    def __init__(self, source: Tuple, users: Set[ID], expires: float):
+        super().__init__()
+        self.source = source  # supervisors in config
+        self.users = frozenset(users)
+        self.names: Optional[str] = None
+        self.expired = time.time() + expires
+
+    def contains(self, identifier: ID) -> bool:
+        """ check whether the ID is a supervisor, or a group in config """
+        if identifier in self.users:
+            return True
+        for array in self.source:
+            if str(identifier) in array:
+                return True
+        return False
+
+
+@Singleton
+class SupervisorCache(Logging):
+    """ Supervisors for config sections,
+        refreshed in background when expired,
+        reloaded when config changed, or group members/documents updated.
+    """
+
+    EXPIRES = 600  # seconds
+
+    def __init__(self):
+        super().__init__()
+        # section => supervisors
+        self.__entries: Dict[str, _Supervisors] = {}
+        self.__refreshing: Set[str] = set()
+
+    @classmethod
+    def _get_source(cls, config: Config, section: str) -> Tuple:
+        """ supervisors in config sections """
+        array = _config_list(config=config, section=section)
+        if section == 'system':
+            return array,
+        return array, _config_list(config=config, section='system')
+
+    async def _load(self, config: Config, facebook: Facebook, section: str) -> _Supervisors:
+        source = self._get_source(config=config, section=section)
+        users = await _load_supervisors(config=config, facebook=facebook, section=section)
+        entry = _Supervisors(source=source, users=users, expires=self.EXPIRES)
+        self.__entries[section] = entry
+        self.info(msg='supervisors loaded: [%s] %d user(s)' % (section, len(users)))
+        return entry
+
+    async def _refresh(self, config: Config, facebook: Facebook, section: str):
+        try:
+            await self._load(config=config, facebook=facebook, section=section)
+        except Exception as error:
+            self.error(msg='failed to refresh supervisors: [%s] %s' % (section, error))
+        finally:
+            self.__refreshing.discard(section)
+
+    async def _get_entry(self, config: Config, facebook: Facebook, section: str) -> _Supervisors:
+        entry = self.__entries.get(section)
+        if entry is None or entry.source != self._get_source(config=config, section=section):
+            # first loading, or config changed
+            return await self._load(config=config, facebook=facebook, section=section)
+        if entry.expired < time.time() and section not in self.__refreshing:
+            # expired, refresh in background and return the old one now
+            self.__refreshing.add(section)
+            asyncio.ensure_future(self._refresh(config=config, facebook=facebook, section=section))
+        return entry
+
+    async def get_users(self, config: Config, facebook: Facebook, section: str = 'system') -> Set[ID]:
+        entry = await self._get_entry(config=config, facebook=facebook, section=section)
+        return entry.users
+
+    async def get_names(self, config: Config, facebook: CommonFacebook, section: str = 'system') -> str:
+        entry = await self._get_entry(config=config, facebook=facebook, section=section)
+        names = entry.names
+        if names is None:
+            lines = await md_user_name_list(users=entry.users, facebook=facebook)
+            names = '\n'.join(lines)
+            entry.names = names
+        return names
+
+    def invalidate(self, identifier: ID) -> int:
+        """ remove cached sections which contain this user/group """
+        count = 0
+        for section in list(self.__entries.keys()):
+            entry = self.__entries.get(section)
+            if entry is not None and entry.contains(identifier=identifier):
+                self.__entries.pop(section, None)
+                count += 1
+        if count > 0:
+            self.info(msg='supervisors invalidated by: %s' % identifier)
+        return count
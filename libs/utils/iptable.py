@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    IP Table
+    ~~~~~~~~
+
+    Offline IP range database (country & ASN), compiled from CSV lines:
+
+        start_ip,end_ip,country,asn
+
+    into a sorted binary file which is memory-mapped for binary search.
+
+    File format:
+
+        'IPRT' + count(uint32) + records[count]
+
+        record: start(16 bytes) + end(16 bytes) + country(2 bytes) + asn(uint32)
+
+    IPv4 addresses are stored as IPv4-mapped IPv6 addresses (::ffff:a.b.c.d),
+    so all keys have the same width and compare as big-endian bytes.
+"""
+
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+from typing import Optional, Union, List
+
+from dimples.utils import Logging
+from dimples.utils import Config
+from dimples.utils import Singleton
+
+from .lru import LRUCache
+
+
+_MAGIC = b'IPRT'
+_HEAD = struct.Struct('>4sI')
+_RECORD = struct.Struct('>16s16s2sI')
+
+_V4_MAPPED = 0xffff << 32
+
+
+def ip_to_int(ip: str) -> Optional[int]:
+    """ convert IPv4/IPv6 string to 128-bit integer """
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+    if address.version == 4:
+        return _V4_MAPPED | int(address)
+    return int(address)
+
+
+def int_to_ip(value: int) -> str:
+    """ convert 128-bit integer back to IP string """
+    if value >> 32 == 0xffff:
+        return str(ipaddress.IPv4Address(value & 0xffffffff))
+    return str(ipaddress.IPv6Address(value))
+
+
+def _parse_ip_value(text: str) -> Optional[int]:
+    text = text.strip()
+    if text.isdigit():
+        # integer form, IPv4 only
+        return _V4_MAPPED | int(text)
+    return ip_to_int(ip=text)
+
+
+class IPLocation:
+    """ Country & ASN for an IP range """
+
+    __slots__ = ('country', 'asn')
+
+    def __init__(self, country: Optional[str], asn: int):
+        super().__init__()
+        self.country = country
+        self.asn = asn
+
+    @property
+    def as_name(self) -> Optional[str]:
+        return None if self.asn == 0 else 'AS%d' % self.asn
+
+    def __str__(self) -> str:
+        country = self.country
+        as_name = self.as_name
+        if as_name is None:
+            return '%s' % country
+        elif country is None:
+            return as_name
+        return '%s %s' % (country, as_name)
+
+
+def compile_ip_table(csv_path: str, table_path: str) -> int:
+    """ compile CSV ranges into sorted binary table, return count of records """
+    ranges = []
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) < 3 or row[0].startswith('#'):
+                continue
+            start = _parse_ip_value(text=row[0])
+            end = _parse_ip_value(text=row[1])
+            if start is None or end is None or end < start:
+                # header or error line
+                continue
+            country = row[2].strip().upper()
+            country = country.encode('ascii', 'ignore')[:2].ljust(2, b'\0')
+            asn = row[3].strip().upper() if len(row) > 3 else ''
+            if asn.startswith('AS'):
+                asn = asn[2:]
+            asn = int(asn) if asn.isdigit() else 0
+            ranges.append((start, end, country, asn))
+    ranges.sort(key=lambda item: item[0])
+    # write into temporary file and rename it
+    temp = '%s.tmp' % table_path
+    with open(temp, 'wb') as file:
+        file.write(_HEAD.pack(_MAGIC, len(ranges)))
+        for start, end, country, asn in ranges:
+            file.write(_RECORD.pack(start.to_bytes(16, 'big'), end.to_bytes(16, 'big'), country, asn))
+    os.replace(temp, table_path)
+    return len(ranges)
+
+
+class IPTable:
+    """ Memory-mapped sorted IP ranges """
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        super().__init__()
+        self.__file = open(path, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEAD.unpack_from(self.__map, 0)
+        assert magic == _MAGIC, 'IP table error: %s' % path
+        self.__count = count
+        self.__cache: LRUCache[str, IPLocation] = LRUCache(capacity=cache_size)
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    @property
+    def cache(self) -> LRUCache:
+        return self.__cache
+
+    def __start(self, index: int) -> bytes:
+        offset = _HEAD.size + index * _RECORD.size
+        return self.__map[offset:offset+16]
+
+    def _search(self, key: bytes) -> Optional[IPLocation]:
+        # find the last range which start <= key
+        lo = 0
+        hi = self.__count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if self.__start(index=mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        offset = _HEAD.size + (lo - 1) * _RECORD.size
+        _, end, country, asn = _RECORD.unpack_from(self.__map, offset)
+        if key > end:
+            return None
+        country = country.rstrip(b'\0').decode('ascii')
+        return IPLocation(country=country if len(country) > 0 else None, asn=asn)
+
+    def lookup(self, ip: str) -> Optional[IPLocation]:
+        cache = self.__cache
+        location, found = cache.fetch(key=ip)
+        if found:
+            return location
+        value = ip_to_int(ip=ip)
+        if value is None:
+            location = None
+        else:
+            location = self._search(key=value.to_bytes(16, 'big'))
+        # cache empty result too
+        cache.put(key=ip, value=location)
+        return location
+
+
+@Singleton
+class IPLocator(Logging):
+    """
+        Load IP table from config:
+
+            [statistic]
+            ip_ranges = /data/geoip/ip_ranges.csv
+            ip_table  = /data/geoip/ip_ranges.dat
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.__config: Optional[Config] = None
+        self.__table: Optional[IPTable] = None
+        self.__loaded = False
+
+    @property
+    def config(self) -> Optional[Config]:
+        return self.__config
+
+    @config.setter
+    def config(self, conf: Config):
+        self.__config = conf
+        self.__loaded = False
+
+    def _load(self) -> Optional[IPTable]:
+        conf = self.__config
+        if conf is None:
+            return None
+        options = conf.get_section(section='statistic')
+        if options is None:
+            return None
+        csv_path = options.get('ip_ranges')
+        table_path = options.get('ip_table')
+        if table_path is None:
+            return None
+        try:
+            # compile table when source updated
+            if csv_path is not None and os.path.exists(csv_path):
+                if not os.path.exists(table_path) or os.path.getmtime(table_path) < os.path.getmtime(csv_path):
+                    count = compile_ip_table(csv_path=csv_path, table_path=table_path)
+                    self.info(msg='IP table compiled: %s -> %s, %d range(s)' % (csv_path, table_path, count))
+            if not os.path.exists(table_path):
+                self.warning(msg='IP table not found: %s' % table_path)
+                return None
+            table = IPTable(path=table_path)
+            self.info(msg='IP table loaded: %s, %d range(s)' % (table_path, table.count))
+            return table
+        except Exception as error:
+            self.error(msg='failed to load IP table: %s, %s' % (table_path, error))
+
+    @property
+    def table(self) -> Optional[IPTable]:
+        if not self.__loaded:
+            self.__loaded = True
+            old = self.__table
+            self.__table = self._load()
+            if old is not None:
+                old.close()
+        return self.__table
+
+    def lookup(self, ip: Union[str, List[str], None]) -> Optional[IPLocation]:
+        """ get location for IP, or the first located one in IP list """
+        table = self.table
+        if table is None or ip is None:
+            return None
+        elif isinstance(ip, str):
+            return table.lookup(ip=ip)
+        for item in ip:
+            location = table.lookup(ip=item)
+            if location is not None:
+                return location
+
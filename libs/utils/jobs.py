@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    Background Jobs
+    ~~~~~~~~~~~~~~~
+
+    Run heavy tasks (e.g. reports) in a worker pool on the current event loop,
+    so the message processing won't be blocked.
+"""
+
+import asyncio
+import time
+from typing import Optional, Callable, Awaitable, List, Dict
+
+from dimples.utils import Logging
+
+
+class Job:
+    """ Background job """
+
+    WAITING = 'waiting'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, sn: int, title: str, owner, factory: Callable[[], Awaitable]):
+        super().__init__()
+        self.sn = sn
+        self.title = title
+        self.owner = owner
+        self.factory = factory
+        self.status = self.WAITING
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in (self.FINISHED, self.FAILED, self.CANCELLED)
+
+    # Override
+    def __str__(self) -> str:
+        return '<Job sn=%d status="%s" title="%s" />' % (self.sn, self.status, self.title)
+
+
+class JobRunner(Logging):
+    """ Worker pool for background jobs """
+
+    def __init__(self, workers: int = 2, max_jobs: int = 32):
+        super().__init__()
+        assert workers > 0, 'workers count error: %d' % workers
+        self.__workers_count = workers
+        self.__max_jobs = max_jobs
+        self.__workers: List[asyncio.Task] = []
+        self.__queue: Optional[asyncio.Queue] = None
+        # sn => job
+        self.__jobs: Dict[int, Job] = {}
+        self.__next_sn = 0
+
+    @property
+    def workers(self) -> int:
+        return self.__workers_count
+
+    @property
+    def is_full(self) -> bool:
+        """ submit() will reject new jobs """
+        return len(self.__jobs) >= self.__max_jobs
+
+    def all_jobs(self) -> List[Job]:
+        """ waiting & running jobs """
+        return list(self.__jobs.values())
+
+    def get_job(self, sn: int) -> Optional[Job]:
+        return self.__jobs.get(sn)
+
+    def __start(self):
+        if self.__queue is not None:
+            return
+        self.__queue = asyncio.Queue()
+        for index in range(self.__workers_count):
+            self.__workers.append(asyncio.ensure_future(self._work(index=index)))
+
+    def submit(self, title: str, owner, factory: Callable[[], Awaitable]) -> Optional[Job]:
+        """ add a job, return None when too many jobs waiting """
+        if self.is_full:
+            self.warning(msg='too many jobs: %d, reject "%s"' % (len(self.__jobs), title))
+            return None
+        self.__start()
+        self.__next_sn += 1
+        job = Job(sn=self.__next_sn, title=title, owner=owner, factory=factory)
+        self.__jobs[job.sn] = job
+        self.__queue.put_nowait(job)
+        self.info(msg='job added: %s, waiting: %d' % (job, self.__queue.qsize()))
+        return job
+
+    def cancel(self, sn: int) -> Optional[Job]:
+        job = self.__jobs.pop(sn, None)
+        if job is None:
+            return None
+        job.status = Job.CANCELLED
+        task = job.task
+        if task is not None:
+            task.cancel()
+        self.info(msg='job cancelled: %s' % job)
+        return job
+
+    async def _work(self, index: int):
+        queue = self.__queue
+        while True:
+            job: Job = await queue.get()
+            if job.status == Job.CANCELLED:
+                # cancelled before running
+                continue
+            job.status = Job.RUNNING
+            job.started = time.time()
+            job.task = asyncio.ensure_future(job.factory())
+            try:
+                await job.task
+                job.status = Job.FINISHED
+            except asyncio.CancelledError:
+                if job.status != Job.CANCELLED:
+                    # worker cancelled
+                    raise
+            except Exception as error:
+                job.status = Job.FAILED
+                self.error(msg='worker %d: job failed: %s, %s' % (index, job, error))
+            finally:
+                job.task = None
+                self.__jobs.pop(job.sn, None)
+            self.info(msg='worker %d: job done: %s, %.3f seconds' % (index, job, time.time() - job.started))
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    Priority Lanes
+    ~~~~~~~~~~~~~~
+
+    Separate queues for different kinds of tasks, scheduled by weights,
+    so the interactive tasks won't wait behind thousands of bulk tasks.
+
+    Tasks with the same key (e.g.: sender) never run at the same time,
+    they are run one by one in the order of taking out from the lanes.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional, Callable, Awaitable, List, Dict
+
+from dimples.utils import Logging
+
+
+class Lane:
+    """ Task queue with weight """
+
+    def __init__(self, name: str, weight: int, capacity: int):
+        super().__init__()
+        assert weight > 0, 'lane weight error: %s, %d' % (name, weight)
+        self.name = name
+        self.weight = weight
+        self.capacity = capacity
+        self.tasks = deque()
+        # tasks held behind a running task with the same key
+        self.held = 0
+        # smooth weighted round-robin
+        self.current = 0
+        # statistics
+        self.processed = 0
+        self.dropped = 0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        return len(self.tasks) + self.held
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            'name': self.name,
+            'weight': self.weight,
+            'waiting': len(self.tasks),
+            'held': self.held,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'max_wait': self.max_wait,
+        }
+
+    # Override
+    def __str__(self) -> str:
+        return '<Lane name="%s" weight=%d waiting=%d held=%d />' % (self.name, self.weight, len(self.tasks),
+                                                                    self.held)
+
+
+class LaneScheduler(Logging):
+    """ Worker pool picking tasks from lanes by weights """
+
+    def __init__(self, workers: int = 2):
+        super().__init__()
+        assert workers > 0, 'workers count error: %d' % workers
+        self.__workers_count = workers
+        self.__workers: List[asyncio.Task] = []
+        self.__event: Optional[asyncio.Event] = None
+        # name => lane
+        self.__lanes: Dict[str, Lane] = {}
+        # key => tasks waiting for the running one with same key
+        self.__running: Dict[str, deque] = {}
+
+    @property
+    def workers(self) -> int:
+        return self.__workers_count
+
+    @workers.setter
+    def workers(self, count: int):
+        """ change workers count before the first task submitted """
+        assert count > 0, 'workers count error: %d' % count
+        assert self.__event is None, 'workers already started'
+        self.__workers_count = count
+
+    @property
+    def stats(self) -> List[Dict]:
+        return [lane.stats for lane in self.__lanes.values()]
+
+    def add_lane(self, name: str, weight: int, capacity: int = 65536) -> Lane:
+        lane = Lane(name=name, weight=weight, capacity=capacity)
+        self.__lanes[name] = lane
+        return lane
+
+    def get_lane(self, name: str) -> Optional[Lane]:
+        return self.__lanes.get(name)
+
+    def __start(self):
+        if self.__event is not None:
+            return
+        self.__event = asyncio.Event()
+        for index in range(self.__workers_count):
+            self.__workers.append(asyncio.ensure_future(self._work(index=index)))
+
+    def submit(self, lane: str, factory: Callable[[], Awaitable], key: Optional[str] = None) -> bool:
+        """ add a task into the lane, return False when the lane is full """
+        queue = self.__lanes.get(lane)
+        assert queue is not None, 'lane not found: %s' % lane
+        if len(queue) >= queue.capacity:
+            queue.dropped += 1
+            self.error(msg='lane is full, drop task: %s, dropped: %d' % (queue, queue.dropped))
+            return False
+        self.__start()
+        queue.tasks.append((time.time(), factory, key))
+        self.__event.set()
+        return True
+
+    def _next(self) -> Optional[Lane]:
+        """ smooth weighted round-robin among non-empty lanes """
+        selected = None
+        total = 0
+        for lane in self.__lanes.values():
+            if len(lane.tasks) == 0:
+                continue
+            lane.current += lane.weight
+            total += lane.weight
+            if selected is None or lane.current > selected.current:
+                selected = lane
+        if selected is not None:
+            selected.current -= total
+        return selected
+
+    async def _work(self, index: int):
+        event = self.__event
+        running = self.__running
+        while True:
+            lane = self._next()
+            if lane is None:
+                event.clear()
+                await event.wait()
+                continue
+            queued, factory, key = lane.tasks.popleft()
+            if key is not None:
+                followers = running.get(key)
+                if followers is not None:
+                    # same key is running by another worker, run after it
+                    followers.append((lane, queued, factory))
+                    lane.held += 1
+                    continue
+                followers = deque()
+                running[key] = followers
+            await self._run(index=index, lane=lane, queued=queued, factory=factory)
+            if key is None:
+                continue
+            while len(followers) > 0:
+                lane, queued, factory = followers.popleft()
+                lane.held -= 1
+                await self._run(index=index, lane=lane, queued=queued, factory=factory)
+            running.pop(key, None)
+
+    async def _run(self, index: int, lane: Lane, queued: float, factory: Callable[[], Awaitable]):
+        start = time.time()
+        waited = start - queued
+        if waited > lane.max_wait:
+            lane.max_wait = waited
+        try:
+            await factory()
+        except Exception as error:
+            self.error(msg='worker %d: lane task failed: %s, %s' % (index, lane, error))
+        lane.processed += 1
+        cost = time.time() - start
+        if cost > 1.0:
+            self.warning(msg='worker %d: lane task too slow: %s, waited %.3f, cost %.3f seconds'
+                             % (index, lane, waited, cost))
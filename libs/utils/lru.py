@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    LRU Cache
+    ~~~~~~~~~
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import TypeVar, Generic, Optional, Tuple, Set, Dict
+
+from dimples.utils import Singleton
+
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """ Size-bounded cache, drops the least recently used entry when full
+
+        life_span       - seconds to keep a value (None means forever)
+        empty_life_span - seconds to keep an empty value (negative caching)
+    """
+
+    def __init__(self, capacity: int = 1024, life_span: float = None, empty_life_span: float = None):
+        super().__init__()
+        assert capacity > 0, 'cache capacity error: %d' % capacity
+        self.__capacity = capacity
+        self.__life_span = life_span
+        self.__empty_life_span = life_span if empty_life_span is None else empty_life_span
+        # key => (value, expired time)
+        self.__entries: Dict[K, Tuple[Optional[V], Optional[float]]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.__entries
+
+    def fetch(self, key: K, now: float = None) -> Tuple[Optional[V], bool]:
+        """ get (value, found), the value can be None when it was cached as empty """
+        with self.__lock:
+            entries = self.__entries
+            entry = entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None, False
+            expired = entry[1]
+            if expired is not None:
+                if now is None:
+                    now = time.time()
+                if now > expired:
+                    entries.pop(key, None)
+                    self.__misses += 1
+                    return None, False
+            entries.move_to_end(key)
+            self.__hits += 1
+            return entry[0], True
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        value, found = self.fetch(key=key)
+        return value if found else default
+
+    def put(self, key: K, value: Optional[V], now: float = None):
+        life_span = self.__life_span if value is not None else self.__empty_life_span
+        if life_span is None:
+            expired = None
+        elif now is None:
+            expired = time.time() + life_span
+        else:
+            expired = now + life_span
+        with self.__lock:
+            entries = self.__entries
+            entries[key] = (value, expired)
+            entries.move_to_end(key)
+            while len(entries) > self.__capacity:
+                entries.popitem(last=False)
+
+    def erase(self, key: K) -> Optional[V]:
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+        if entry is not None:
+            return entry[0]
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def purge(self, now: float = None) -> int:
+        """ remove expired entries """
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            entries = self.__entries
+            keys = [key for key, entry in entries.items() if entry[1] is not None and now > entry[1]]
+            for key in keys:
+                entries.pop(key, None)
+        return len(keys)
+
+    @property
+    def stats(self) -> Dict:
+        """ hits, misses & hit rate """
+        hits = self.__hits
+        misses = self.__misses
+        total = hits + misses
+        return {
+            'size': len(self.__entries),
+            'capacity': self.__capacity,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': 0.0 if total == 0 else hits / total,
+        }
+
+
+@Singleton
+class LRUCacheManager:
+    """ Shared LRU caches with names """
+
+    def __init__(self):
+        super().__init__()
+        self.__caches: Dict[str, LRUCache] = {}
+        self.__lock = threading.Lock()
+
+    def all_names(self) -> Set[str]:
+        return set(self.__caches.keys())
+
+    def get_cache(self, name: str, capacity: int = 1024,
+                  life_span: float = None, empty_life_span: float = None) -> LRUCache:
+        """ get cache with name, create it if not exists """
+        cache = self.__caches.get(name)
+        if cache is None:
+            with self.__lock:
+                cache = self.__caches.get(name)
+                if cache is None:
+                    cache = LRUCache(capacity=capacity, life_span=life_span, empty_life_span=empty_life_span)
+                    self.__caches[name] = cache
+        return cache
+
+    def erase(self, key) -> int:
+        """ remove key from all caches (e.g. when the document of an ID updated) """
+        count = 0
+        for name in self.all_names():
+            cache = self.__caches.get(name)
+            if cache is not None and key in cache:
+                cache.erase(key=key)
+                count += 1
+        return count
+
+    def purge(self, now: float = None) -> int:
+        count = 0
+        for name in self.all_names():
+            cache = self.__caches.get(name)
+            if cache is not None:
+                count += cache.purge(now=now)
+        return count
+
+    @property
+    def stats(self) -> Dict[str, Dict]:
+        """ name => stats """
+        info = {}
+        for name in sorted(self.all_names()):
+            cache = self.__caches.get(name)
+            if cache is not None:
+                info[name] = cache.stats
+        return info
@@ -36,6 +36,7 @@ from dimples import utf8_encode, base64_encode
 from dimples import Visa
 
 from .visa import get_name
+from .lru import LRUCache, LRUCacheManager
 
 
 def md_esc(text: str) -> str:
@@ -43,12 +44,7 @@ def md_esc(text: str) -> str:
         return ''
     elif not isinstance(text, str):
         text = str(text)
-    escape = ''
-    for c in text:
-        if c in _md_chars:
-            escape += '\\'
-        escape += c
-    return escape
+    return text.translate(_md_table)
 
 
 _md_chars = {
@@ -61,12 +57,31 @@ _md_chars = {
     '"', "'",
 }
 
+_md_table = str.maketrans({c: '\\%s' % c for c in _md_chars})
+
 
 def md_user_url(visa: Visa) -> str:
+    """ markdown link with user card, cached until the visa changed """
+    did = visa.get('did')
+    signature = visa.get('signature')
+    cache = _user_url_cache()
+    if did is not None and signature is not None:
+        cached = cache.get(key=did)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
     name = get_name(visa=visa)
     text = md_user_info(visa=visa)
     href = _data_url(text=text)
-    return '[%s](%s "")' % (name, href)
+    url = '[%s](%s "")' % (name, href)
+    if did is not None and signature is not None:
+        cache.put(key=did, value=(signature, url))
+    return url
+
+
+def _user_url_cache() -> LRUCache:
+    # ID => (signature, markdown)
+    man = LRUCacheManager()
+    return man.get_cache(name='md.user', capacity=10240)
 
 
 def md_user_info(visa: Visa) -> str:
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    Report Builder
+    ~~~~~~~~~~~~~~
+
+    Streams markdown table rows into size-bounded pages,
+    each page will be sent out as soon as it's full.
+"""
+
+from typing import Optional, Callable, Awaitable, List
+
+
+class ReportBuilder:
+
+    PAGE_SIZE = 64 * 1024  # max characters for one page
+
+    def __init__(self, send_page: Callable[[str, int], Awaitable], page_size: int = None):
+        """
+        Create report builder
+
+        :param send_page: async callback with (text, page index)
+        :param page_size: max characters for one page
+        """
+        super().__init__()
+        self.__send_page = send_page
+        self.__page_size = self.PAGE_SIZE if page_size is None else page_size
+        self.__header: Optional[str] = None
+        self.__rows: List[str] = []
+        self.__size = 0
+        self.__pages = 0
+        self.__count = 0
+
+    @property
+    def header(self) -> Optional[str]:
+        """ table header, repeated on each page """
+        return self.__header
+
+    @header.setter
+    def header(self, text: str):
+        self.__header = text
+
+    @property
+    def pages(self) -> int:
+        """ count of pages sent """
+        return self.__pages
+
+    @property
+    def count(self) -> int:
+        """ count of rows added """
+        return self.__count
+
+    async def add_row(self, row: str):
+        size = len(row)
+        if self.__size > 0 and self.__size + size > self.__page_size:
+            await self._flush(footer='\n... (page %d)' % (self.__pages + 1))
+        self.__rows.append(row)
+        self.__size += size
+        self.__count += 1
+
+    async def finish(self, footer: str = '') -> int:
+        """ send the last page with footer, return count of pages """
+        if self.__pages > 0:
+            footer = '\n... (page %d, end)\n\n%s' % (self.__pages + 1, footer)
+        elif self.__count > 0:
+            footer = '\n%s' % footer
+        await self._flush(footer=footer)
+        return self.__pages
+
+    async def _flush(self, footer: str):
+        rows = self.__rows
+        header = self.__header
+        if header is None or len(rows) == 0:
+            text = ''.join(rows) + footer
+        else:
+            text = header + ''.join(rows) + footer
+        self.__rows = []
+        self.__size = 0
+        page = self.__pages
+        self.__pages = page + 1
+        await self.__send_page(text, page)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2026 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+
+"""
+    Throttle
+    ~~~~~~~~
+
+    Single-flight: identical queries in flight share one computation.
+    Rate limiter: token bucket for each key (e.g. sender).
+"""
+
+import asyncio
+import time
+from typing import Generic, TypeVar, Callable, Awaitable, Dict
+
+from .lru import LRUCache
+
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class SingleFlight(Generic[K, V]):
+    """ Coalesce concurrent calls with the same key """
+
+    def __init__(self):
+        super().__init__()
+        self.__flights: Dict[K, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self.__flights)
+
+    async def run(self, key: K, factory: Callable[[], Awaitable[V]]) -> V:
+        """ run factory, or wait for the result of the same key in flight """
+        flight = self.__flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(factory())
+            self.__flights[key] = flight
+            flight.add_done_callback(lambda _: self.__flights.pop(key, None))
+        # shield the shared computation from the waiter's cancellation
+        return await asyncio.shield(flight)
+
+
+class TokenBucket:
+    """ Token bucket, refills 'rate' tokens per second, up to 'capacity' """
+
+    def __init__(self, capacity: float, rate: float, now: float = None):
+        super().__init__()
+        self.__capacity = capacity
+        self.__rate = rate
+        self.__tokens = capacity
+        self.__time = time.time() if now is None else now
+
+    def consume(self, tokens: float = 1, now: float = None) -> bool:
+        if now is None:
+            now = time.time()
+        elapsed = now - self.__time
+        if elapsed > 0:
+            self.__tokens = min(self.__capacity, self.__tokens + elapsed * self.__rate)
+            self.__time = now
+        if self.__tokens < tokens:
+            return False
+        self.__tokens -= tokens
+        return True
+
+
+class RateLimiter(Generic[K]):
+    """ Token buckets for keys, the least recently used buckets will be dropped """
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 1024):
+        super().__init__()
+        self.__capacity = capacity
+        self.__rate = rate
+        self.__buckets: LRUCache[K, TokenBucket] = LRUCache(capacity=max_keys)
+
+    def allow(self, key: K, tokens: float = 1, now: float = None) -> bool:
+        buckets = self.__buckets
+        bucket = buckets.get(key=key)
+        if bucket is None:
+            bucket = TokenBucket(capacity=self.__capacity, rate=self.__rate, now=now)
+            buckets.put(key=key, value=bucket)
+        return bucket.consume(tokens=tokens, now=now)